@@ -1,5 +1,6 @@
 import Bio
 from Bio import SeqIO
+from records import Gene, Transcript, Exon
 
 __author__ = 'mwelland'
 __version__ = 1.3
@@ -27,7 +28,7 @@ class GbkParser:
                                                                           sequence (with pad)
     """
 
-    def __init__(self, file_name, padding, trim_flanking):
+    def __init__(self, file_name, padding, trim_flanking, record=None, transcripts=None, exon_range=None):
 
         """
         This class is created by instantiating with a file name and a padding value.
@@ -37,17 +38,28 @@ class GbkParser:
         '''
         :param file_name: the location/identity of the target input file
         :param padding: the required amount of intronic padding
+        :param record: a SeqRecord already read from the file (see iterate_records);
+                       if None, the first record in the file is used
+        :param transcripts: transcript numbers to keep, None for all
+        :param exon_range: (first, last) exon numbers to slice sequence for, None for all
         '''
         self.trim_flanking = trim_flanking
+        self.transcripts = transcripts
+        self.exon_range = exon_range
         self.exons = []
         self.cds = []
         self.mrna = []
         self.fileName = file_name
         # Read in the specified input file into a variable
         try:
-            self.transcriptdict = dict(transcripts={}, input=SeqIO.to_dict(SeqIO.parse(file_name, 'genbank')),
-                                       pad=int(padding), pad_offset=int(padding) % 5)
-            self.transcriptdict['refseqname'] = self.transcriptdict['input'].keys()[0]
+            if record is None:
+                # Only the first record is read, however many the file holds
+                with open(file_name) as handle:
+                    record = next(SeqIO.parse(handle, 'genbank'), None)
+                if record is None:
+                    raise ValueError('No GenBank records found in %s' % file_name)
+            self.transcriptdict = Gene(int(padding), input={record.id: record})
+            self.transcriptdict['refseqname'] = record.id
             self.is_matt_awesome = True
         except IOError as fileNotPresent:
             print "The specified file cannot be located: " + fileNotPresent.filename
@@ -57,6 +69,20 @@ class GbkParser:
 
         assert self.transcriptdict['pad'] <= 2000, "Padding too large, please use a value below 2000 bases"
 
+    @classmethod
+    def iterate_records(cls, file_name, padding, trim_flanking, transcripts=None, exon_range=None):
+        """
+        Parses a multi-record GenBank file (e.g. a gene panel export) one record at
+        a time, so only a single record is held in memory at once
+        :return: generator of (parser, dictionary), one for each record in the file
+        """
+        with open(file_name) as handle:
+            for record in SeqIO.parse(handle, 'genbank'):
+                parser = cls(file_name, padding, trim_flanking, record, transcripts, exon_range)
+                yield parser, parser.run()
+                # Let this record go before the next one is read
+                parser = record = None
+
     @property
     def get_version(self):
         """
@@ -106,9 +132,7 @@ class GbkParser:
             the exon positions in the dictionary""" 
 
         for alternative in self.transcriptdict['Alt transcripts']:
-            self.transcriptdict['transcripts'][alternative] = {}
-            self.transcriptdict['transcripts'][alternative]['list_of_exons'] = []
-            self.transcriptdict['transcripts'][alternative]['exons'] = {}
+            self.transcriptdict['transcripts'][alternative] = Transcript()
             selected_mrna = self.mrna[alternative-1]
             try:
                 self.transcriptdict['transcripts'][alternative]['NM_number'] = selected_mrna.qualifiers['transcript_id'][0]
@@ -120,30 +144,55 @@ class GbkParser:
             subfeatures = selected_mrna._get_sub_features()
             
             for coords in subfeatures:
-                self.transcriptdict['transcripts'][alternative]['exons'][exon] = {}
+                self.transcriptdict['transcripts'][alternative]['exons'][exon] = Exon()
                 self.transcriptdict['transcripts'][alternative]['list_of_exons'].append(exon)
                 self.transcriptdict['transcripts'][alternative]['exons'][exon]['genomic_start'] = coords.location.start
                 self.transcriptdict['transcripts'][alternative]['exons'][exon]['genomic_end'] = coords.location.end
                 exon += 1
             # print self.transcriptdict['transcripts'][alternative]
 
+    def wanted_exon(self, exon_number):
+        return self.exon_range is None or self.exon_range[0] <= exon_number <= self.exon_range[1]
+
+    def select_transcripts(self):
+        """ Drops any transcript which was not asked for """
+        if self.transcripts is None:
+            return
+        available = sorted(self.transcriptdict['transcripts'])
+        if not set(self.transcripts) & set(available):
+            raise ValueError('%s has no transcript %s, only %s' % (self.fileName, ', '.join(
+                str(transcript) for transcript in sorted(self.transcripts)), ', '.join(map(str, available))))
+        for transcript in available:
+            if transcript not in self.transcripts:
+                del self.transcriptdict['transcripts'][transcript]
+
     def get_exon_contents(self):
         """
         This function is supplied with the list of exon tagged blocks from the features section
         and populates the exons region of the dictionary with the exon number, coordinates, and
-        sequence segments which define the exon
+        sequence segments which define the exon. Transcripts not asked for and exons outside
+        the exon range are not sliced; those exons keep only their coordinates
         """
         '''
         :param exons: a list of the exon objects from the GenBank features list
         '''
+        exon_records = {}
         for alternative in self.transcriptdict['Alt transcripts']:
+            if self.transcripts is not None and alternative not in self.transcripts:
+                continue
             sequence = self.transcriptdict['full genomic sequence']
             for exon_number in self.transcriptdict['transcripts'][alternative]['exons'].keys():
+                if not self.wanted_exon(exon_number):
+                    continue
                 start = self.transcriptdict['transcripts'][alternative]['exons'][exon_number]['genomic_start']
                 end = self.transcriptdict['transcripts'][alternative]['exons'][exon_number]['genomic_end']
-                seq = sequence[start:end]
                 pad = self.transcriptdict['pad']
                 exon_list = self.transcriptdict['transcripts'][alternative]['list_of_exons']
+                # Flank boundaries are found first, so that exons shared between
+                # transcripts are only sliced once and share a single record
+                pad5 = None
+                pad3 = None
+                repeats = 1
                 if pad != 0:
                     if self.trim_flanking:
                         if exon_number < len(exon_list)-1:
@@ -153,13 +202,13 @@ class GbkParser:
                                 half_way_point = int(round((next_start - (end+1))/2))
                                 if half_way_point % 2 == 1:
                                     half_way_point -= 1
-                                pad3 = sequence[end:end+half_way_point]
+                                pad3 = (end, end+half_way_point)
                             else:
                                 assert end + pad <= len(sequence), "Exon index out of bounds"
-                                pad3 = sequence[end:end + pad]
+                                pad3 = (end, end + pad)
                         else:
                             assert end + pad <= len(sequence), "Exon index out of bounds"
-                            pad3 = sequence[end:end + pad]
+                            pad3 = (end, end + pad)
 
                         if exon_number != exon_list[0]:
                             previous_exon = exon_list[exon_number-2]
@@ -168,21 +217,28 @@ class GbkParser:
                                 half_way_point = int(round((start - (previous_end+1))/2))
                                 if half_way_point % 2 == 1:
                                     half_way_point -= 1 
-                                pad5 = sequence[previous_end+half_way_point+1:start]
+                                pad5 = (previous_end+half_way_point+1, start)
                             else:
                                 assert start - pad >= 0, "Exon index out of bounds"
-                                pad5 = sequence[start - (pad):start]
+                                pad5 = (start - (pad), start)
                         else:
                             assert start - pad >= 0, "Exon index out of bounds"
-                            pad5 = sequence[start - (pad):start]
+                            pad5 = (start - (pad), start)
                     else:
                         assert start - pad >= 0, "Exon index out of bounds"
                         assert end + pad <= len(sequence), "Exon index out of bounds"
-                        pad3 = sequence[end:end + pad]
-                        pad5 = sequence[start - (pad + 1):start - 1]
-                        seq = pad5.lower() + seq + pad3.lower()
-                    seq = pad5.lower() + seq + pad3.lower()
-                self.transcriptdict['transcripts'][alternative]['exons'][exon_number]['sequence'] = seq
+                        pad3 = (end, end + pad)
+                        pad5 = (start - (pad + 1), start - 1)
+                        # The untrimmed flanks have always been added twice
+                        repeats = 2
+                key = (start, end, pad5, pad3, repeats)
+                if key not in exon_records:
+                    seq = sequence[start:end]
+                    if pad != 0:
+                        for repeat in range(repeats):
+                            seq = sequence[pad5[0]:pad5[1]].lower() + seq + sequence[pad3[0]:pad3[1]].lower()
+                    exon_records[key] = Exon(start, end, seq)
+                self.transcriptdict['transcripts'][alternative]['exons'][exon_number] = exon_records[key]
 
     def fill_and_find_features(self):
         dictionary = self.transcriptdict['input'][self.transcriptdict['refseqname']]
@@ -234,4 +290,5 @@ class GbkParser:
         self.get_protein()
         self.get_exon_contents()
         self.find_cds_delay()
+        self.select_transcripts()
         return self.transcriptdict
@@ -1,8 +1,14 @@
 from xml.etree.ElementTree import parse
+try:
+    from xml.etree.cElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+from records import Gene, Transcript, Exon
+from mapped_sequence import MappedSequence
 
 __author__ = 'mwelland'
-__version__ = 1.3
-__version_date__ = '11/02/2015'
+__version__ = 1.4
+__version_date__ = '18/10/2026'
 
 
 class LrgParser:
@@ -32,29 +38,39 @@ class LrgParser:
                                                                           sequence (with pad)
     """
 
-    def __init__(self, file_name, padding, trim_flanking):
+    def __init__(self, file_name, padding, trim_flanking, streaming=False, mapped=False, transcripts=None,
+                 exon_range=None):
         self.fileName = file_name
         self.trim_flanking = trim_flanking
+        self.streaming = streaming
+        # Transcript numbers and (first, last) exon numbers to render, None for all
+        self.transcripts = transcripts
+        self.exon_range = exon_range
+        self.genseq = None
         # Read in the specified input file into a variable
         try:
-            self.tree = parse(self.fileName)
-            self.transcriptdict = {'transcripts': {},
-                                   'root': self.tree.getroot(),
-                                   'pad': int(padding),
-                                   'pad_offset': int(padding) % 5}
-            self.transcriptdict['fixannot'] = self.transcriptdict['root'].find(
-                'fixed_annotation')  # ensures only exons from the fixed annotation will be taken
-            self.transcriptdict['updatable'] = self.transcriptdict['root'].find(
-                'updatable_annotation')
-            self.transcriptdict['genename'] = self.transcriptdict['root'].find(
-                'updatable_annotation/annotation_set/lrg_locus').text
-            self.transcriptdict['refseqname'] = self.transcriptdict['root'].find(
-                'fixed_annotation/sequence_source').text
-
-            if self.transcriptdict['root'].attrib['schema_version'] != '1.9':
-                print 'This LRG file is not the correct version for this script'
-                print 'This is designed for v.1.8'
-                print 'This file is v.' + self.transcriptdict['root'].attrib['schema_version']
+            if mapped:
+                # Exon windows are sliced from the mapped file, the XML is parsed without the sequence
+                try:
+                    self.genseq = MappedSequence(self.fileName)
+                except ValueError as unmapped:
+                    print 'Reading the whole sequence, it cannot be mapped: %s' % unmapped
+            if self.streaming:
+                # Only check the file can be opened, it is read in one pass by stream_file()
+                open(self.fileName).close()
+                self.transcriptdict = Gene(int(padding))
+            else:
+                self.tree = parse(self.xml_source())
+                self.transcriptdict = Gene(int(padding), root=self.tree.getroot())
+                self.transcriptdict['fixannot'] = self.transcriptdict['root'].find(
+                    'fixed_annotation')  # ensures only exons from the fixed annotation will be taken
+                self.transcriptdict['updatable'] = self.transcriptdict['root'].find(
+                    'updatable_annotation')
+                self.transcriptdict['genename'] = self.transcriptdict['root'].find(
+                    'updatable_annotation/annotation_set/lrg_locus').text
+                self.transcriptdict['refseqname'] = self.transcriptdict['root'].find(
+                    'fixed_annotation/sequence_source').text
+                self.check_schema_version(self.transcriptdict['root'].attrib['schema_version'])
             self.is_matt_awesome = True
         except IOError as fileNotPresent:
             print "The specified file cannot be located: " + fileNotPresent.filename
@@ -74,6 +90,19 @@ class LrgParser:
         """
         return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
 
+    def xml_source(self):
+        """ The file for ElementTree to read; with a mapped sequence the sequence text is left out """
+        if self.genseq is not None:
+            return self.genseq.xml_source()
+        return self.fileName
+
+    @staticmethod
+    def check_schema_version(schema_version):
+        if schema_version != '1.9':
+            print 'This LRG file is not the correct version for this script'
+            print 'This is designed for v.1.8'
+            print 'This file is v.' + schema_version
+
     # Grabs the sequence string from the <sequence/> tagged block
     def grab_element(self, path):
         """ Grabs specific element from the xml file from a provided path """
@@ -90,21 +119,25 @@ class LrgParser:
     def get_nm(self):
         annotation_sets = self.transcriptdict['updatable'].findall('annotation_set')
         for annotation_set in annotation_sets:
-            if annotation_set.attrib['type'] == 'ncbi':
-                features = annotation_set.find('features')
-                genes = features.findall('gene') # Multiple 'genes' includedin LRG
-                for gene in genes:
-                    transcripts = gene.findall('transcript')
-                    for transcript_block in transcripts:
-                        try:
-                            t_number = transcript_block.attrib['fixed_id'][1:]
-                            # print transcript_block.attrib['accession']
-                            self.transcriptdict['transcripts'][int(t_number)]['NM_number'] = transcript_block.attrib['accession']
-                            protein_block = transcript_block.find('protein_product')
-                            if t_number == protein_block.attrib['fixed_id'][1:]:
-                                self.transcriptdict['transcripts'][int(t_number)]['NP_number'] = protein_block.attrib['accession']
-                        except KeyError:
-                            print 'found redundant transcript'
+            self.get_set_accessions(annotation_set)
+
+    def get_set_accessions(self, annotation_set):
+        """ Takes the NM and NP accessions from a single ncbi annotation set """
+        if annotation_set.attrib['type'] == 'ncbi':
+            features = annotation_set.find('features')
+            genes = features.findall('gene') # Multiple 'genes' includedin LRG
+            for gene in genes:
+                transcripts = gene.findall('transcript')
+                for transcript_block in transcripts:
+                    try:
+                        t_number = transcript_block.attrib['fixed_id'][1:]
+                        # print transcript_block.attrib['accession']
+                        self.transcriptdict['transcripts'][int(t_number)]['NM_number'] = transcript_block.attrib['accession']
+                        protein_block = transcript_block.find('protein_product')
+                        if t_number == protein_block.attrib['fixed_id'][1:]:
+                            self.transcriptdict['transcripts'][int(t_number)]['NP_number'] = protein_block.attrib['accession']
+                    except KeyError:
+                        print 'found redundant transcript'
 
     def get_exon_coords(self):
         """ Traverses the LRG ETree to find all the useful values
@@ -114,43 +147,74 @@ class LrgParser:
         """
 
         for items in self.transcriptdict['fixannot'].findall('transcript'):
-            t_number = int(items.attrib['name'][1:])
-            # print 'first t number = ' + str(t_number)
-            self.transcriptdict['transcripts'][t_number] = {}  # First should be indicated with '1'; 'p1' can write on
-            self.transcriptdict['transcripts'][t_number]["exons"] = {}
-            self.transcriptdict['transcripts'][t_number]['list_of_exons'] = []
-            # Gene sequence main coordinates are required to take introns
-            # Transcript coordinates wanted for output  
-            genomic_start = 0
-            genomic_end = 0
-            for exon in items.iter('exon'):
-                exon_number = exon.attrib['label']
-                if exon_number[-1] in ('a', 'b', 'c', 'd'):
-                    # print exon_number
-                    exon_number = exon_number[:-1]
-                exon_number = int(exon_number)
-                self.transcriptdict['transcripts'][t_number]['list_of_exons'].append(exon_number)
-                self.transcriptdict['transcripts'][t_number]["exons"][exon_number] = {}
-                for coordinates in exon:
-                    if coordinates.attrib['coord_system'][-2] not in ['t', 'p']:
-                        genomic_start = int(coordinates.attrib['start'])
-                        genomic_end = int(coordinates.attrib['end'])
-                assert genomic_start >= 0, "Exon index out of bounds"
-                self.transcriptdict['transcripts'][t_number]["exons"][exon_number]['genomic_start'] = genomic_start
-                self.transcriptdict['transcripts'][t_number]["exons"][exon_number]['genomic_end'] = genomic_end
+            self.get_transcript_coords(items)
+
+    def get_transcript_coords(self, items):
+        """ Populates the exon coordinates from a single fixed annotation <transcript> """
+        t_number = int(items.attrib['name'][1:])
+        # print 'first t number = ' + str(t_number)
+        self.transcriptdict['transcripts'][t_number] = Transcript()  # First should be indicated with '1'; 'p1' can write on
+        # Gene sequence main coordinates are required to take introns
+        # Transcript coordinates wanted for output
+        genomic_start = 0
+        genomic_end = 0
+        for exon in items.iter('exon'):
+            exon_number = exon.attrib['label']
+            if exon_number[-1] in ('a', 'b', 'c', 'd'):
+                # print exon_number
+                exon_number = exon_number[:-1]
+            exon_number = int(exon_number)
+            self.transcriptdict['transcripts'][t_number]['list_of_exons'].append(exon_number)
+            self.transcriptdict['transcripts'][t_number]["exons"][exon_number] = Exon()
+            for coordinates in exon:
+                if coordinates.attrib['coord_system'][-2] not in ['t', 'p']:
+                    genomic_start = int(coordinates.attrib['start'])
+                    genomic_end = int(coordinates.attrib['end'])
+            assert genomic_start >= 0, "Exon index out of bounds"
+            self.transcriptdict['transcripts'][t_number]["exons"][exon_number]['genomic_start'] = genomic_start
+            self.transcriptdict['transcripts'][t_number]["exons"][exon_number]['genomic_end'] = genomic_end
+
+    def wanted_exon(self, exon_number):
+        return self.exon_range is None or self.exon_range[0] <= exon_number <= self.exon_range[1]
+
+    def select_transcripts(self):
+        """ Drops any transcript which was not asked for """
+        if self.transcripts is None:
+            return
+        available = sorted(self.transcriptdict['transcripts'])
+        if not set(self.transcripts) & set(available):
+            raise ValueError('%s has no transcript %s, only %s' % (self.fileName, ', '.join(
+                str(transcript) for transcript in sorted(self.transcripts)), ', '.join(map(str, available))))
+        for transcript in available:
+            if transcript not in self.transcripts:
+                del self.transcriptdict['transcripts'][transcript]
 
     def grab_exon_contents(self, genseq):
+        """
+        Fills in the sequence of every exon, with its flanking intronic sequence.
+        The flank boundaries are worked out first; exons in different transcripts
+        with the same coordinates and flanks then share one exon record, so each
+        distinct exon is sliced from the genomic sequence only once
 
+        Transcripts not asked for, and exons outside the exon range, are not sliced
+        at all; those exons keep only their coordinates
+        """
+        exon_records = {}
         transcripts = self.transcriptdict['transcripts'].keys()
         for transcript in transcripts:
+            if self.transcripts is not None and transcript not in self.transcripts:
+                continue
             exon_list = self.transcriptdict['transcripts'][transcript]['list_of_exons']
             for position in range(len(exon_list)):
                 exon_number = exon_list[position]
+                if not self.wanted_exon(exon_number):
+                    continue
                 genomic_start = self.transcriptdict['transcripts'][transcript]['exons'][exon_number]['genomic_start']
                 genomic_end = self.transcriptdict['transcripts'][transcript]['exons'][exon_number]['genomic_end']
-                seq = genseq[genomic_start - 1:genomic_end]
                 pad = self.transcriptdict['pad']
                 exon_number = int(exon_number)
+                pad5 = None
+                pad3 = None
                 if pad != 0:
                     if self.trim_flanking:
                         if exon_number < len(exon_list)-1:
@@ -161,15 +225,15 @@ class LrgParser:
                                 # print 'halfway = ' + str(half_way_point)
                                 if half_way_point % 2 == 1:
                                     half_way_point -= 1
-                                pad3 = genseq[genomic_end:genomic_end+half_way_point]
+                                pad3 = (genomic_end, genomic_end+half_way_point)
                                 # print 'Transcript: %s , exon %s clashes with exon %s' % (transcript, exon_number, next_exon)
                                 
                             else:
                                 assert genomic_end + pad <= len(genseq), "Exon index out of bounds"
-                                pad3 = genseq[genomic_end:genomic_end + pad]
+                                pad3 = (genomic_end, genomic_end + pad)
                         else:
                             assert genomic_end + pad <= len(genseq), "Exon index out of bounds"
-                            pad3 = genseq[genomic_end:genomic_end + pad]
+                            pad3 = (genomic_end, genomic_end + pad)
 
                         if exon_number != exon_list[0]:
                             previous_exon = exon_list[position-1]
@@ -179,33 +243,81 @@ class LrgParser:
                                 #Maybe don't subtract from both halves; split uneven length for full seq
                                 if half_way_point % 2 == 1:
                                     half_way_point -= 1  
-                                pad5 = genseq[previous_end+half_way_point: genomic_start-1]
+                                pad5 = (previous_end+half_way_point, genomic_start-1)
                             else:
                                 assert genomic_start - pad >= 0, "Exon index out of bounds"
-                                pad5 = genseq[genomic_start - (pad + 1):genomic_start - 1]
+                                pad5 = (genomic_start - (pad + 1), genomic_start - 1)
                         else:
                             assert genomic_start - pad >= 0, "Exon index out of bounds"
-                            pad5 = genseq[genomic_start - (pad + 1):genomic_start - 1]
+                            pad5 = (genomic_start - (pad + 1), genomic_start - 1)
                     else:
                         assert genomic_start - pad >= 0, "Exon index out of bounds"
                         assert genomic_end + pad <= len(genseq), "Exon index out of bounds"
-                        pad3 = genseq[genomic_end:genomic_end + pad]
-                        pad5 = genseq[genomic_start - (pad + 1):genomic_start - 1]
-
-                    seq = pad5.lower() + seq + pad3.lower()
+                        pad3 = (genomic_end, genomic_end + pad)
+                        pad5 = (genomic_start - (pad + 1), genomic_start - 1)
 
-                self.transcriptdict['transcripts'][transcript]["exons"][exon_number]['sequence'] = seq
+                key = (genomic_start, genomic_end, pad5, pad3)
+                if key not in exon_records:
+                    seq = genseq[genomic_start - 1:genomic_end]
+                    if pad != 0:
+                        seq = genseq[pad5[0]:pad5[1]].lower() + seq + genseq[pad3[0]:pad3[1]].lower()
+                    exon_records[key] = Exon(genomic_start, genomic_end, seq)
+                self.transcriptdict['transcripts'][transcript]["exons"][exon_number] = exon_records[key]
 
     def get_protein_exons(self):
         """ Collects full protein sequence for the appropriate transcript """
         for item in self.transcriptdict['fixannot'].findall('transcript'):
-            p_number = int(item.attrib['name'][1:])
-            coding_region = item.find('coding_region')
-            coordinates = coding_region.find('coordinates')
-            self.transcriptdict['transcripts'][p_number]['cds_offset'] = int(coordinates.attrib['start'])
-            translation = coding_region.find('translation')
-            sequence = translation.find('sequence').text
-            self.transcriptdict['transcripts'][p_number]['protein_seq'] = sequence + '* '  # Stop codon
+            self.get_transcript_protein(item)
+
+    def get_transcript_protein(self, item):
+        """ Collects the CDS start and protein sequence from a single fixed annotation <transcript> """
+        p_number = int(item.attrib['name'][1:])
+        coding_region = item.find('coding_region')
+        coordinates = coding_region.find('coordinates')
+        self.transcriptdict['transcripts'][p_number]['cds_offset'] = int(coordinates.attrib['start'])
+        translation = coding_region.find('translation')
+        sequence = translation.find('sequence').text
+        self.transcriptdict['transcripts'][p_number]['protein_seq'] = sequence + '* '  # Stop codon
+
+    def stream_file(self):
+        """ Reads the whole LRG file in a single iterparse pass, in place of the
+            ElementTree based grab_element/get_exon_coords/get_nm/get_protein_exons
+
+            Each fixed annotation transcript and updatable annotation set is passed
+            to the same methods used for the full tree as soon as it is complete,
+            and is then removed from its parent so that the document never builds up
+            :return: the genomic sequence from fixed_annotation/sequence
+        """
+        gen_seq = None
+        path = []
+        elements = []
+        for event, element in iterparse(self.xml_source(), events=('start', 'end')):
+            if event == 'start':
+                path.append(element.tag)
+                elements.append(element)
+                if len(path) == 1:
+                    self.check_schema_version(element.attrib['schema_version'])
+                continue
+
+            if path[1:] == ['fixed_annotation', 'sequence_source']:
+                self.transcriptdict['refseqname'] = element.text
+            elif path[1:] == ['fixed_annotation', 'sequence']:
+                gen_seq = element.text
+            elif path[1:] == ['fixed_annotation', 'transcript']:
+                self.get_transcript_coords(element)
+                self.get_transcript_protein(element)
+            elif path[1:] == ['updatable_annotation', 'annotation_set', 'lrg_locus']:
+                if 'genename' not in self.transcriptdict:
+                    self.transcriptdict['genename'] = element.text
+            elif path[1:] == ['updatable_annotation', 'annotation_set']:
+                self.get_set_accessions(element)
+
+            path.pop()
+            elements.pop()
+            # Discard completed blocks directly below fixed/updatable annotation
+            if 1 <= len(path) <= 2:
+                elements[-1].remove(element)
+        return gen_seq
 
     def find_cds_delay(self, transcript):
         """ Method to find the actual start of the translated sequence
@@ -217,20 +329,33 @@ class LrgParser:
             g_stop = self.transcriptdict['transcripts'][transcript]['exons'][exon]['genomic_end']
             if offset > g_stop:
                 offset_total = offset_total + (g_stop - g_start) + 1
-            elif g_stop > offset > g_start:
+            elif g_stop >= offset >= g_start:
                 self.transcriptdict['transcripts'][transcript]['cds_offset'] = offset_total + (offset - g_start)
                 break
 
     def run(self):
         # Initial sequence grabbing and populating dictionaries
-        gen_seq = self.grab_element('fixed_annotation/sequence')
-        self.get_exon_coords()
-        self.get_nm()
-        self.grab_exon_contents(gen_seq)
-        self.get_protein_exons()
+        if self.streaming:
+            gen_seq = self.stream_file()
+            if self.genseq is not None:
+                gen_seq = self.genseq
+            self.grab_exon_contents(gen_seq)
+        else:
+            if self.genseq is not None:
+                gen_seq = self.genseq
+            else:
+                gen_seq = self.grab_element('fixed_annotation/sequence')
+            self.get_exon_coords()
+            self.get_nm()
+            self.grab_exon_contents(gen_seq)
+            self.get_protein_exons()
+        if self.genseq is not None:
+            self.genseq.close()
+            self.genseq = None
 
         for transcript in self.transcriptdict['transcripts'].keys():
             self.transcriptdict['transcripts'][transcript]['list_of_exons'].sort(key=float)
             self.find_cds_delay(transcript)
+        self.select_transcripts()
 
         return self.transcriptdict
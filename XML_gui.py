@@ -1,13 +1,8 @@
 # -*- coding: utf-8 -*-
 import argparse
-from Tkinter import *
-from tkFileDialog import askopenfilename
-from LrgParser import LrgParser
-from GbkParser import GbkParser
-from reader import Reader
-from latex_writer import LatexWriter
-from subprocess import call
-from primer_module import primer
+import sys
+from referencer import check_file_type, render_file, find_gene, parse_transcripts, parse_exon_range
+from multiprocessing import cpu_count
 import os
 
 __author__ = 'mwelland'
@@ -120,126 +115,74 @@ def about():
     print '\nSo gene\nSuch reference\nWow'
 
 
-def run_parser():
-
-    padding = 300
-    directory_and_file = entry.get()
-    file_name = directory_and_file.split('/')[-2] + '/' + directory_and_file.split('/')[-1]
-    file_type = check_file_type(file_name)
-    username = entry_name.get()
-    dictionary = {}
-    nm = ''
-    parser_details = ''
-    #primer_list = [name.split('.')[0] for name in os.listdir('primers')]
-    primer_list = os.listdir('primers')
-    primer_applied = False
-    if file_type == 'gbk':
-        print 'Running parser'
-        gbk_reader = GbkParser(file_name, padding, args.trim_flanking)
-        dictionary = gbk_reader.run()
-        parser_details = gbk_reader.get_version
-    elif file_type == 'lrg':
-        print 'Running parser'
-        lrg_reader = LrgParser(file_name, padding, args.trim_flanking)
-        dictionary  = lrg_reader.run()
-        parser_details = lrg_reader.get_version
-
-    if dictionary['genename']+'.csv' in primer_list:
-        primer_applied = True
-        primer_label = primer()
-        primer_details = 'Primer Labels: ' + primer_label.get_version
-        dictionary = primer_label.run(dictionary, os.getcwd())
-
-    parser_details = '{0} {1} {2}'.format(file_type.upper(), 'Parser:', parser_details)
+def translate(directory_and_file, username, transcripts_text, exons_text):
+    """
+    The work of the Translate button; --headless runs it directly, without Tk
+    :param directory_and_file: input file, or a gene symbol to find in input/
+    :param transcripts_text: contents of the Transcripts box
+    :param exons_text: contents of the Exons box
+    """
+    if os.path.exists(directory_and_file):
+        file_name = directory_and_file
+    else:
+        # Not a file, so take it as a gene symbol and look it up in the input directory
+        matches = find_gene(directory_and_file.strip())
+        if not matches:
+            print 'No file or gene called %s was found in input/' % directory_and_file
+            sys.exit(1)
+        if len(matches) > 1:
+            print 'Gene %s is in %s, using the first' % (directory_and_file, ', '.join(matches))
+        file_name = matches[0]
+    try:
+        check_file_type(file_name)
+    except ValueError:
+        print 'This program only works for GenBank and LRG files'
+        sys.exit(1)
+    # Blank boxes render every transcript and exon
+    try:
+        transcripts = parse_transcripts(transcripts_text) or None
+        exon_range = parse_exon_range(exons_text) if exons_text.strip() else None
+    except ValueError:
+        print 'Transcripts should be numbers such as 1,3 and exons a number or range such as 5-9'
+        sys.exit(1)
+    render_file(file_name, 'output', username, trim_flanking=args.trim_flanking,
+                print_clashes=args.print_clashes, write_as_latex=args.write_as_latex,
+                control_version=get_version(), latex_jobs=cpu_count(),
+                metrics_file=os.path.join('output', 'metrics.jsonl'),
+                transcripts=transcripts, exon_range=exon_range)
 
+    print "Process has completed successfully"
 
-    os.chdir("output")
-    for transcript in dictionary['transcripts']:  
-        print 'transcript: %d' % transcript  
-        
-        input_reader = Reader()
-        writer = LatexWriter()
-        reader_details = 'Reader: ' + input_reader.get_version
-        writer_details = 'Writer: ' + writer.get_version
-        xml_gui_details = 'Control: ' + get_version()
-        if primer_applied:
-            list_of_versions = [parser_details, reader_details, \
-                            writer_details, xml_gui_details, primer_details]
-        else:
-            list_of_versions = [parser_details, reader_details, \
-                            writer_details, xml_gui_details]
-        lrg_num = file_name.split('.')[0].split('/')[1].replace('_', '\_')+'t'+str(transcript)
-        input_list, nm = input_reader.run(dictionary, transcript, args.write_as_latex, list_of_versions, args.print_clashes, file_type, lrg_num, username)
-        if file_type == 'gbk':
-            filename = dictionary['genename']+'_'+ nm
-        else:
-            filename = dictionary['genename']+'_'+ file_name.split('.')[0].split('/')[1]+'t'+str(transcript)
-        if args.write_as_latex:
-            latex_file, pdf_file = writer.run(input_list, filename, args.write_as_latex)
-            call(["pdflatex", "-interaction=batchmode", latex_file])
-            clean_up(os.getcwd(), pdf_file)
-            move_files(latex_file)
-        else:
-            latex_file = writer.run(input_list, filename, args.write_as_latex)
-        
-        
-        # quick step to allow for non-overlapping writes
-        print str(transcript) + ' has been printed'
 
-    print "Process has completed successfully"
+def run_parser():
+    translate(entry.get(), entry_name.get(), entry_transcripts.get(), entry_exons.get())
     root.quit()
-    
-def kill_the_spare():
-    pass
-
-def move_files(latex):
-    os.rename(latex, os.path.join('tex files', latex))
-    
-def clean_up(path, pdf_file):
-    pdf_split = pdf_file.split('_')
-    pwd_files = os.listdir(path)
-    pdf_files = [doc for doc in pwd_files if \
-                doc.split('.')[-1] == 'pdf']
-    for target in pdf_files:        
-        if target == 'tex files':
-            pass  
-        else:
-            target_split = target.split('_')
-            if target_split[0:3] == pdf_split[0:3]\
-                and target_split[-2:] != pdf_split[-2:]:
-                os.remove(os.path.join(path, target))
-    targets = [doc for doc in pwd_files if \
-                doc.split('.')[-1] not in keep_extensions]
-    for target in targets:
-        if target == 'tex files':
-            pass   
-        else:   
-            os.remove(os.path.join(path, target))
-        
 
-def check_file_type(file_name):
-    """ This function takes the file name which has been selected
-        as input. This will identify .xml and .gk/gbk files, and
-        will print an error message and exit the application if
-        a file is used which does not match either of these types
-    """
-    if file_name[-4:] == '.xml':
-        return 'lrg'
-    elif file_name[-3:] == '.gb':
-        return 'gbk'
-    elif file_name[-4:] == '.gbk':
-        return 'gbk'
-    else:
-        print 'This program only works for GenBank and LRG files'
-        exit()
 
 arg_parser = argparse.ArgumentParser(description='Customise reference sequence settings')
 arg_parser.add_argument('--trim', dest='trim_flanking', action='store_false', default=True)
 arg_parser.add_argument('--clashes', dest='print_clashes', action='store_false', default=True)
 arg_parser.add_argument('--text', dest='write_as_latex', action='store_false', default=True)
+arg_parser.add_argument('--transcripts', default='', help='initial contents of the Transcripts box, e.g. 1,3')
+arg_parser.add_argument('--exons', default='', help='initial contents of the Exons box, e.g. 5-9')
+arg_parser.add_argument('--user', dest='username', default='Anonymous User', help='initial User Name')
+arg_parser.add_argument('--headless', metavar='FILE_OR_GENE', default=None,
+                        help='translate this file or gene straight away, without opening the window')
 args=arg_parser.parse_args()
 
-keep_extensions = ['pdf', 'tex']
+if args.headless:
+    try:
+        translate(args.headless, args.username, args.transcripts, args.exons)
+    except SystemExit as error:
+        # The parsers stop with a bare exit() when a file cannot be read
+        if not error.code:
+            sys.exit(1)
+        raise
+    sys.exit(0)
+
+# Tk is only loaded when the window is wanted
+from Tkinter import *
+from tkFileDialog import askopenfilename
 
 root = Tk()
 menu = Menu(root)
@@ -247,7 +190,7 @@ root.config(menu=menu)
 helpmenu = Menu(menu)
 menu.add_command(label="Help", command=about)
 
-text_in_label = Label(root, text="File name:")
+text_in_label = Label(root, text="File name or gene:")
 text_in_label.grid(row=0, column=1, sticky='w')
 entry = Entry(root)
 entry.grid(row=0, column=2, sticky='w')
@@ -259,11 +202,23 @@ text2 = Label(root, text="User Name:")
 text2.grid(row=3, column=1, sticky='w')
 entry_name = Entry(root)
 entry_name.grid(row=3, column=2, sticky='w')
-entry_name.insert(0, 'Anonymous User')
+entry_name.insert(0, args.username)
+
+text3 = Label(root, text="Transcripts:")
+text3.grid(row=4, column=1, sticky='w')
+entry_transcripts = Entry(root)
+entry_transcripts.grid(row=4, column=2, sticky='w')
+entry_transcripts.insert(0, args.transcripts)
+
+text4 = Label(root, text="Exons:")
+text4.grid(row=5, column=1, sticky='w')
+entry_exons = Entry(root)
+entry_exons.grid(row=5, column=2, sticky='w')
+entry_exons.insert(0, args.exons)
 
 button = Button(root, text="QUIT", fg="red", command=root.quit)
-button.grid(row=4, column=1)
+button.grid(row=6, column=1)
 parser = Button(root, text="Translate", fg="blue", command=run_parser)
-parser.grid(row=4, column=2)
+parser.grid(row=6, column=2)
 
 mainloop()
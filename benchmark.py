@@ -0,0 +1,353 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from StringIO import StringIO
+from Queue import Empty
+from multiprocessing import Process, Queue
+try:
+    import resource
+except ImportError:
+    # Unix only; peak memory is reported as unavailable without it
+    resource = None
+
+from referencer import check_file_type, parse_file, apply_primers, reader_engines, default_padding, pdf_backends
+from latex_writer import LatexWriter
+from pdf_writer import PdfWriter
+from typesetter import typeset_all
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Benchmark harness for the full pipeline
+
+        python -m benchmark --save results.json
+        python -m benchmark --baseline results.json --threshold 0.1
+
+    Every LRG file in input/ and input/GB_TEST.gb is run through the parse,
+    primer, render and write stages (and pdflatex with --pdf), timing each
+    stage separately; with --pdf-backend native the write stage produces
+    the PDF itself. Each gene runs in a fresh worker process so that the
+    peak memory reported for it is its own. A file is counted as failed if
+    any stage raises, if pdflatex fails for any transcript, or if its worker
+    dies or runs for longer than --timeout. The report gives the total time
+    of each stage, peak memory, genes and bases per second, and the slowest
+    genes. Results can be saved as JSON and compared against a saved
+    baseline over the files both runs rendered: any stage (or the total)
+    slower than the baseline by more than the threshold is reported as a
+    regression, and the exit status is then 1
+
+    The cold start time of the headless entry point is measured too: the
+    median time for a new interpreter to import referencer, beside that of
+    an interpreter doing nothing, as a scheduler starting thousands of short
+    jobs would pay it. Any of startup_modules loaded by the import is listed
+'''
+
+stages = ['parse', 'primers', 'render', 'write', 'typeset']
+# Slow imports which starting an LRG job should not need
+startup_modules = ('Bio', 'Tkinter')
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+def default_inputs(basepath):
+    inputs = sorted(glob.glob(os.path.join(basepath, 'input', '*.xml')))
+    genbank = os.path.join(basepath, 'input', 'GB_TEST.gb')
+    if os.path.exists(genbank):
+        inputs.append(genbank)
+    return inputs
+
+
+def peak_memory_kb():
+    """
+    Peak resident memory of this process in KB (ru_maxrss is in bytes on OS X)
+    :return: None where the resource module is not available (Windows)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak
+
+
+def empty_result(file_name):
+    """ The result of a file before any stage has run, as recorded for a file which fails """
+    result = {'file': os.path.basename(file_name), 'success': False, 'error': '',
+              'transcripts': 0, 'bases': 0, 'peak_kb': None}
+    result.update((stage, 0.0) for stage in stages)
+    return result
+
+
+def benchmark_file(task):
+    """
+    Runs one input file through every stage, in its own worker process
+    :return: dictionary of the timings and counts for the file
+    """
+    file_name, options = task
+    result = empty_result(file_name)
+    saved_stdout = sys.stdout
+    sys.stdout = StringIO()
+    output_dir = tempfile.mkdtemp(prefix='benchmark-')
+    os.mkdir(os.path.join(output_dir, 'tex files'))
+    try:
+        file_type = check_file_type(file_name)
+        start = time.time()
+        dictionary, parser_details = parse_file(file_name, file_type, options['padding'], True,
+                                                options['streaming'])
+        result['parse'] = time.time() - start
+
+        start = time.time()
+        apply_primers(dictionary, options['basepath'])
+        result['primers'] = time.time() - start
+
+        latex_files = []
+        for transcript in dictionary['transcripts']:
+            exons = dictionary['transcripts'][transcript]['exons']
+            result['bases'] += sum(len(exon['sequence']) for exon in exons.values())
+            start = time.time()
+            input_list, nm = reader_engines[options['engine']]().run(
+                dictionary, transcript, True, [parser_details], True, file_type, 'benchmark', 'benchmark')
+            result['render'] += time.time() - start
+
+            start = time.time()
+            filename = os.path.join(output_dir, '%s_t%d' % (dictionary['genename'], transcript))
+            if options['pdf_backend'] == 'native':
+                PdfWriter().run(input_list, filename, True)
+            else:
+                latex_files.append(LatexWriter().run(input_list, filename, True) + (output_dir,))
+            result['write'] += time.time() - start
+            result['transcripts'] += 1
+
+        if options['typeset'] and latex_files:
+            start = time.time()
+            typeset_jobs = typeset_all(latex_files, 1)
+            result['typeset'] = time.time() - start
+            failed = [job for job in typeset_jobs if not job.success]
+            if failed:
+                raise RuntimeError('pdflatex failed for %s: %s' % (failed[0].latex_name, failed[0].error))
+        result['gene'] = dictionary['genename']
+        result['success'] = True
+    except (Exception, SystemExit) as error:
+        result['error'] = repr(error)
+    finally:
+        sys.stdout = saved_stdout
+        shutil.rmtree(output_dir, ignore_errors=True)
+    result['peak_kb'] = peak_memory_kb()
+    return result
+
+
+def median(values):
+    return sorted(values)[len(values) / 2]
+
+
+def cold_start(runs):
+    """
+    Starts new interpreters which import the headless entry point, and others which do nothing
+    :return: dictionary of the median seconds of each and the startup_modules which were loaded
+    """
+    package = os.path.dirname(os.path.abspath(__file__))
+    script = 'import sys, referencer; print " ".join(name for name in %r if name in sys.modules)' % \
+             (startup_modules,)
+    import_times = []
+    interpreter_times = []
+    loaded = ''
+    for run in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', 'pass'])
+        interpreter_times.append(time.time() - start)
+        start = time.time()
+        loaded = subprocess.check_output([sys.executable, '-c', script], cwd=package)
+        import_times.append(time.time() - start)
+    return {'runs': runs, 'seconds': median(import_times), 'interpreter_seconds': median(interpreter_times),
+            'loaded': loaded.split()}
+
+
+def isolated_worker(task, queue):
+    queue.put(benchmark_file(task))
+
+
+def run_isolated(task, poll_interval=0.5):
+    """
+    Runs benchmark_file in a new child process, so that its peak memory is its own. A child
+    which dies without a result (killed for memory, or crashed), or which runs for longer
+    than the file_timeout option, is recorded as a failed file
+    """
+    file_name, options = task
+    queue = Queue()
+    worker = Process(target=isolated_worker, args=(task, queue))
+    worker.start()
+    started = time.time()
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=poll_interval)
+        except Empty:
+            if not worker.is_alive():
+                # The result may have been sent just before the child exited
+                try:
+                    result = queue.get(timeout=poll_interval)
+                except Empty:
+                    result = empty_result(file_name)
+                    result['error'] = 'worker exited with code %s' % worker.exitcode
+            elif options['file_timeout'] and time.time() - started > options['file_timeout']:
+                worker.terminate()
+                result = empty_result(file_name)
+                result['error'] = 'timed out after %ds' % options['file_timeout']
+    worker.join()
+    return result
+
+
+def totals(files):
+    """
+    :return: total seconds for each stage, total bases and successful file count
+    """
+    succeeded = [result for result in files if result['success']]
+    stage_totals = dict((stage, sum(result[stage] for result in succeeded)) for stage in stages)
+    return stage_totals, sum(result['bases'] for result in succeeded), len(succeeded)
+
+
+def run_benchmark(inputs, options):
+    """
+    :return: the per-file results and the summary, as stored in the JSON output
+    """
+    startup = cold_start(options['startup_runs']) if options['startup_runs'] else None
+    start = time.time()
+    files = [run_isolated((file_name, options)) for file_name in inputs]
+    wall = time.time() - start
+    stage_totals, bases, succeeded = totals(files)
+    pipeline = sum(stage_totals.values())
+    summary = {'version': __version__,
+               'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+               'engine': options['engine'],
+               'typeset': options['typeset'],
+               'pdf_backend': options['pdf_backend'],
+               'files': len(files),
+               'failed': [result['file'] for result in files if not result['success']],
+               'wall_seconds': wall,
+               'stage_seconds': stage_totals,
+               'pipeline_seconds': pipeline,
+               'peak_kb': max([result['peak_kb'] for result in files if result['peak_kb'] is not None] or
+                              [None]),
+               'genes_per_second': succeeded / pipeline if pipeline else 0.0,
+               'bases_per_second': bases / pipeline if pipeline else 0.0,
+               'bases': bases,
+               'startup': startup}
+    return {'summary': summary, 'files': files}
+
+
+def file_seconds(result):
+    return sum(result[stage] for stage in stages)
+
+
+def megabytes(peak_kb):
+    return 'unavailable' if peak_kb is None else '%.1f MB' % (peak_kb / 1024.0)
+
+
+def print_report(results, slowest=10):
+    summary = results['summary']
+    print 'Files: %d (%d failed), engine: %s' % (summary['files'], len(summary['failed']), summary['engine'])
+    for stage in stages:
+        print '  %-8s %8.3fs' % (stage, summary['stage_seconds'][stage])
+    print '  %-8s %8.3fs (wall %.3fs)' % ('total', summary['pipeline_seconds'], summary['wall_seconds'])
+    if summary.get('startup'):
+        startup = summary['startup']
+        print 'Cold start: %.3fs to import referencer (%.3fs for the interpreter alone), loaded: %s' % (
+            startup['seconds'], startup['interpreter_seconds'], ', '.join(startup['loaded']) or 'none of ' +
+            ', '.join(startup_modules))
+    print 'Peak memory: %s' % megabytes(summary['peak_kb'])
+    print 'Throughput: %.2f genes/s, %.0f bases/s' % (summary['genes_per_second'], summary['bases_per_second'])
+    if summary['failed']:
+        print 'Failed: ' + ', '.join(summary['failed'])
+    print 'Slowest genes:'
+    ranked = sorted([result for result in results['files'] if result['success']], key=file_seconds, reverse=True)
+    for result in ranked[:slowest]:
+        print '  %-12s %-10s %7.3fs  %2d transcripts  %8d bases  %9s' % (
+            result['file'], result['gene'], file_seconds(result), result['transcripts'], result['bases'],
+            megabytes(result['peak_kb']))
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares the time of each stage, and the total, against a baseline over the
+    files which succeeded in both runs
+    :return: list of regression descriptions, empty if none exceed the threshold
+    """
+    common = set(result['file'] for result in results['files'] if result['success']) & \
+        set(result['file'] for result in baseline['files'] if result['success'])
+    if not common:
+        return ['no files in common with the baseline']
+    current = totals([result for result in results['files'] if result['file'] in common])
+    previous = totals([result for result in baseline['files'] if result['file'] in common])
+    regressions = []
+    for stage in stages:
+        old = previous[0][stage]
+        new = current[0][stage]
+        if old > 0 and new > old * (1 + threshold):
+            regressions.append('%s: %.3fs -> %.3fs (+%.0f%%)' % (stage, old, new, 100 * (new / old - 1)))
+    old = sum(previous[0].values())
+    new = sum(current[0].values())
+    if old > 0 and new > old * (1 + threshold):
+        regressions.append('total: %.3fs -> %.3fs (+%.0f%%)' % (old, new, 100 * (new / old - 1)))
+    if results['summary'].get('startup') and baseline['summary'].get('startup'):
+        old = baseline['summary']['startup']['seconds']
+        new = results['summary']['startup']['seconds']
+        if old > 0 and new > old * (1 + threshold):
+            regressions.append('cold start: %.3fs -> %.3fs (+%.0f%%)' % (old, new, 100 * (new / old - 1)))
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Benchmark the reference sequence pipeline')
+    arg_parser.add_argument('inputs', nargs='*', help='input files, defaults to input/*.xml and GB_TEST.gb')
+    arg_parser.add_argument('--engine', choices=sorted(reader_engines), default='block')
+    arg_parser.add_argument('--stream', dest='streaming', action='store_true', help='streaming LRG parser')
+    arg_parser.add_argument('--pdf', dest='typeset', action='store_true', help='include pdflatex')
+    arg_parser.add_argument('--pdf-backend', choices=pdf_backends, default='pdflatex',
+                            help='native writes each PDF directly in the write stage')
+    arg_parser.add_argument('--save', help='write the results to this JSON file')
+    arg_parser.add_argument('--baseline', help='JSON results to compare against')
+    arg_parser.add_argument('--threshold', type=float, default=0.1,
+                            help='fractional slow-down counted as a regression (default 0.1)')
+    arg_parser.add_argument('--startup-runs', type=int, default=5,
+                            help='interpreters started to time the cold start, 0 to skip it')
+    arg_parser.add_argument('--timeout', dest='file_timeout', type=int, default=600,
+                            help='seconds allowed for each file before it is failed, 0 for no limit')
+    arg_parser.add_argument('--slowest', type=int, default=10, help='number of slowest genes to list')
+    args = arg_parser.parse_args(argv)
+
+    basepath = os.getcwd()
+    options = dict(padding=default_padding, streaming=args.streaming, engine=args.engine,
+                   typeset=args.typeset, pdf_backend=args.pdf_backend, basepath=basepath,
+                   startup_runs=args.startup_runs, file_timeout=args.file_timeout)
+    inputs = [os.path.abspath(name) for name in args.inputs] or default_inputs(basepath)
+    results = run_benchmark(inputs, options)
+    print_report(results, args.slowest)
+    if args.save:
+        with open(args.save, 'w') as out:
+            json.dump(results, out, indent=1, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        if regressions:
+            print 'Regressions against %s (threshold %.0f%%):' % (args.baseline, 100 * args.threshold)
+            for regression in regressions:
+                print '  ' + regression
+            return 1
+        print 'No regressions against %s' % args.baseline
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
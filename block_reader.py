@@ -0,0 +1,327 @@
+import threading
+from bisect import bisect_right
+from reader import Reader
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+
+''' This is an alternative rendering engine for the Reader class, which
+    produces exactly the same output as Reader.print_latex
+
+    The Reader decides every character of the numbering, amino acid and
+    amino acid numbering lines one base at a time, carrying counters from
+    base to base. Each of those characters only depends on the position of
+    the base within the spliced transcript, so here every 60 base block is
+    built directly from that position: the ruler dots are sliced from a
+    prepared string for the exon, the amino acid line is sliced from the
+    protein spaced out to one letter per codon, and the labels ('|11',
+    '|-9', '|*1') are placed at arithmetically computed columns. A label
+    covers the columns after it, as the wait counters do in the Reader.
+
+    Exons are expected as lower case flank, upper case exon, lower case
+    flank. If any exon differs from this the Reader's own engine is used.
+
+    The ruler and base lines of an exon do not depend on the transcript, so
+    they are kept for each exon record of the gene being rendered, and
+    transcripts sharing an exon record (see the parsers' grab_exon_contents)
+    only build the numbering and amino acid lines again. The memo is kept
+    per thread, so concurrent renders (see render_service.py) each keep
+    their own.
+'''
+
+
+class BlockReader(Reader):
+    """
+    Drop-in replacement for Reader, rendering each line block at once
+    """
+
+    line_length = 60
+    # Ruler and base lines for each exon record of the last dictionary rendered in
+    # this thread, kept separately by any subclass which builds its base lines differently
+    memo_state = threading.local()
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'Block Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    def print_latex(self):
+        """
+        Builds the same output as Reader.print_latex, one line block at a time
+        """
+        latex_dict = self.transcriptdict['transcripts'][self.transcript]
+        exon_list = latex_dict['list_of_exons']
+        self.build_cds_map(latex_dict)
+        for position in range(len(exon_list)):
+            if self.is_selected(latex_dict, position) and not self.is_block_shaped(latex_dict, position):
+                return Reader.print_latex(self)
+
+        self.reset_memo()
+        refseqid = self.transcriptdict['refseqname'].replace('_', '\_')  # Required for LaTex
+        if self.write_as_LaTex:
+            self.print_latex_header(refseqid)
+        self.set_cds_coordinates(latex_dict)
+        self.check_all_codons(latex_dict)
+        lines_on_page = 10
+        for position in range(len(exon_list)):
+            if not self.is_selected(latex_dict, position):
+                continue
+            self.print_exon_details(latex_dict, position)
+            blocks = self.exon_blocks(latex_dict, position)
+            for number_string, dna_string, amino_string, amino_number_string in blocks[:-1]:
+                lines_on_page = self.print_block(number_string, dna_string, amino_string,
+                                                 amino_number_string, lines_on_page)
+            number_string, dna_string, amino_string, amino_number_string = blocks[-1]
+            self.print_final_block(number_string, dna_string, amino_string, amino_number_string,
+                                   lines_on_page)
+            if self.write_as_LaTex: self.print_exon_end()
+            lines_on_page = 2
+
+        for version in self.list_of_versions:
+            assert isinstance(version, str)
+            self.line_printer(version)
+
+        if self.write_as_LaTex:
+            self.print_latex_footer()
+
+    @classmethod
+    def clear_memo(cls):
+        """ Drops the lines kept for the last gene rendered in this thread """
+        cls.memo_state.source = None
+        cls.memo_state.exons = {}
+
+    def reset_memo(self):
+        """
+        Starts a new memo unless the dictionary is the one the memo was built for. The memo
+        holds on to its dictionary, so the exon records whose id() keys it stay alive
+        """
+        if getattr(self.memo_state, 'source', None) is not self.transcriptdict:
+            self.memo_state.source = self.transcriptdict
+            self.memo_state.exons = {}
+
+    def is_block_shaped(self, latex_dict, position):
+        """ True if the exon sequence is lower case flank, upper case exon, lower case flank """
+        first_exonic, exon_offset, exonic_length = self.cds_map[position]
+        sequence = str(latex_dict['exons'][latex_dict['list_of_exons'][position]]['sequence'])
+        if len(sequence) == 0 or exonic_length == 0:
+            return False
+        tail = sequence[first_exonic + exonic_length:]
+        return tail == '' or tail.islower()
+
+    def set_cds_coordinates(self, latex_dict):
+        """
+        Positions (in the spliced sequence) used to place every label:
+            cds_start: the base numbered 1, the first base of the first codon
+            protein_end: first base of the final codon in the protein sequence,
+                         after which the '*' numbering begins
+        """
+        protein = latex_dict['protein_seq']
+        self.protein = protein
+        self.cds_start = latex_dict['cds_offset']
+        self.protein_end = self.cds_start + 3 * (len(protein) - 1)
+        self.amino_track = ''.join(amino_acid + '  ' for amino_acid in protein)
+        self.exon_offsets = [self.cds_map[position][1] for position in range(len(self.cds_map))]
+
+    def check_all_codons(self, latex_dict):
+        """
+        Checks the codon for every printed amino acid before the first stop,
+        in the order the Reader would meet them
+        """
+        exon_list = latex_dict['list_of_exons']
+        stop = self.protein.find('*')
+        if stop == -1:
+            stop = len(self.protein)
+        for amino_acid_index in range(stop):
+            spliced_position = self.cds_start + 3 * amino_acid_index
+            if spliced_position >= len(self.spliced_sequence):
+                break
+            amino_acid = self.protein[amino_acid_index]
+            if amino_acid == ' ':
+                continue
+            exon_number = exon_list[bisect_right(self.exon_offsets, spliced_position) - 1]
+            self.check_codon(spliced_position, amino_acid, exon_number, amino_acid_index + 1)
+
+    def exon_ruler(self, length, first_exonic, last_exonic):
+        """
+        The numbering line for an exon with no labels: dots every fifth intronic
+        base counting away from the exon, spaces for the exonic bases
+        """
+        pad = self.transcriptdict['pad']
+        before = ''.join('.' if (pad - index) % 5 == 0 else ' ' for index in range(first_exonic))
+        after = ''.join('.' if index % 5 == 4 else ' ' for index in range(length - last_exonic))
+        return before + ' ' * (last_exonic - first_exonic) + after
+
+    @staticmethod
+    def place_labels(background, start, end, labels):
+        """
+        :param background: the characters for each column of the exon
+        :param start: first column of the line
+        :param end: column after the last column of the line
+        :param labels: (column, text) pairs in column order
+
+        Writes each label over the background. A label takes up as many columns as
+        it has characters; any label starting in a column already covered is dropped
+        """
+        pieces = []
+        cursor = start
+        for column, text in labels:
+            if column < cursor:
+                continue
+            pieces.append(background[cursor:column])
+            pieces.append(text)
+            cursor = column + len(text)
+        if cursor < end:
+            pieces.append(background[cursor:end])
+        return ''.join(pieces)
+
+    def number_labels(self, start, end, spliced_start):
+        """
+        Base number labels for the exonic columns [start, end), where spliced_start
+        is the spliced sequence position of the column 'start'
+        """
+        cds_start = self.cds_start
+        protein_end = self.protein_end
+        first = spliced_start
+        last = spliced_start + end - start
+        labels = []
+        # Untranslated 5' bases are numbered -9, -19...
+        position = first + (cds_start + 1 - first) % 10
+        while position < min(last, cds_start):
+            labels.append((start + position - first, '|' + str(position - cds_start)))
+            position += 10
+        # Coding bases are numbered 1, 11, 21...
+        position = max(first, cds_start)
+        position += (cds_start - position) % 10
+        while position < min(last, protein_end):
+            labels.append((start + position - first, '|' + str(position - cds_start + 1)))
+            position += 10
+        # Bases after the protein are numbered *1, *11...
+        position = max(first, protein_end)
+        position += (protein_end - position) % 10
+        while position < last:
+            labels.append((start + position - first, '|*' + str(position - protein_end + 1)))
+            position += 10
+        return labels
+
+    def amino_labels(self, start, end, spliced_start):
+        """ Amino acid number labels (1, 11, 21...) for the exonic columns [start, end) """
+        cds_start = self.cds_start
+        first = max(spliced_start, cds_start)
+        last = min(spliced_start + end - start, self.protein_end + 1)
+        labels = []
+        position = first + (cds_start - first) % 30
+        while position < last:
+            labels.append((start + position - spliced_start, '|' + str((position - cds_start) / 3 + 1)))
+            position += 30
+        return labels
+
+    def amino_segment(self, spliced_start, spliced_end):
+        """ The amino acid line for the exonic bases between two spliced positions """
+        cds_start = self.cds_start
+        untranslated = max(0, min(spliced_end, cds_start) - spliced_start)
+        translated_start = max(spliced_start, cds_start)
+        translated_end = min(spliced_end, self.protein_end + 1)
+        segment = ' ' * untranslated
+        if translated_end > translated_start:
+            segment += self.amino_track[translated_start - cds_start:translated_end - cds_start]
+        return segment
+
+    def dna_lines(self, sequence, annotations):
+        """
+        Splits the sequence into 60 base lines, adding the primer highlighting
+
+        An annotation still open at a line break is closed on that line and
+        reopened on the next. As in the Reader, an annotation which closes exactly
+        at the end of the exon after a break leaves a short extra line
+        :return: list of base lines, the last being the incomplete final line
+        """
+        length = len(sequence)
+        events = {}
+        for start, end, label in annotations:
+            events.setdefault(start, [None, None])[1] = label
+            events.setdefault(end, [None, None])[0] = True
+        event_positions = sorted(events)
+        lines = []
+        current = []
+        highlight_open = False
+        event_index = 0
+        for line_start in range(0, length, self.line_length):
+            line_end = min(line_start + self.line_length, length)
+            if line_start:
+                if highlight_open:
+                    current.append('}')
+                lines.append(''.join(current))
+                current = ['\\hl{'] if highlight_open else []
+                highlight_open = False
+            cursor = line_start
+            while event_index < len(event_positions) and event_positions[event_index] < line_end:
+                event_position = event_positions[event_index]
+                current.append(sequence[cursor:event_position])
+                cursor = event_position
+                highlight_open = self.apply_events(events[event_position], current, highlight_open)
+                event_index += 1
+            current.append(sequence[cursor:line_end])
+        if event_index < len(event_positions) and event_positions[event_index] == length:
+            if length % self.line_length == 0:
+                if highlight_open:
+                    current.append('}')
+                lines.append(''.join(current))
+                current = ['\\hl{'] if highlight_open else []
+            self.apply_events(events[length], current, highlight_open)
+        lines.append(''.join(current))
+        return lines
+
+    @staticmethod
+    def apply_events(event, current, highlight_open):
+        closes, label = event
+        if closes:
+            current.append('}')
+            highlight_open = False
+        if label is not None:
+            current.append('\\pdfcomment[date]{%s}\\hl{' % label)
+            highlight_open = True
+        return highlight_open
+
+    def exon_blocks(self, latex_dict, position):
+        """
+        :return: list of (number, bases, amino acid, amino acid number) line tuples
+                 for the exon, the last being the incomplete final block
+        """
+        exon_dict = latex_dict['exons'][latex_dict['list_of_exons'][position]]
+        first_exonic, exon_offset, exonic_length = self.cds_map[position]
+        last_exonic = first_exonic + exonic_length
+        annotations = exon_dict.get('annotations', [])
+        memo_key = (id(exon_dict), tuple(annotations))
+        exon_memo = self.memo_state.exons
+        if memo_key not in exon_memo:
+            sequence = str(exon_dict['sequence'])
+            exon_memo[memo_key] = (len(sequence),
+                                   self.exon_ruler(len(sequence), first_exonic, last_exonic),
+                                   self.dna_lines(sequence, annotations))
+        length, ruler, dna = exon_memo[memo_key]
+        amino_background = ' ' * length
+
+        blocks = []
+        for line_start in range(0, length, self.line_length):
+            line_end = min(line_start + self.line_length, length)
+            exonic_start = min(max(line_start, first_exonic), last_exonic)
+            exonic_end = max(min(line_end, last_exonic), exonic_start)
+            spliced_start = exon_offset + exonic_start - first_exonic
+            spliced_end = exon_offset + exonic_end - first_exonic
+
+            number_labels = self.number_labels(exonic_start, exonic_end, spliced_start)
+            number_string = self.place_labels(ruler, line_start, line_end, number_labels)
+            amino_string = (' ' * (exonic_start - line_start) +
+                            self.amino_segment(spliced_start, spliced_end) +
+                            ' ' * (line_end - exonic_end))
+            amino_labels = self.amino_labels(exonic_start, exonic_end, spliced_start)
+            amino_number_string = self.place_labels(amino_background, line_start, line_end, amino_labels)
+            blocks.append((number_string, dna[len(blocks)], amino_string, amino_number_string))
+        # An annotation closing at a line break leaves an extra final line of bases only
+        if len(dna) > len(blocks):
+            blocks.append(('', dna[-1], '', ''))
+        return blocks
@@ -0,0 +1,329 @@
+import argparse
+import os
+import re
+import sys
+from bisect import bisect_right
+from StringIO import StringIO
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Maps HGVS c. positions on to the genomic coordinates of the reference and back
+
+    The Reader works out the c. numbering of each base as it prints it.
+    A TranscriptIndex holds the same numbering for lookups: the genomic
+    start and end of each exon and the spliced position of its first base,
+    in sorted arrays, with the spliced positions of c.1 and of c.*1 (the
+    base after the stop codon) from the parser's cds_offset and protein, as
+    in BlockReader.set_cds_coordinates. Each conversion is then one bisect:
+
+        index = CoordinateIndex(dictionary).transcript(1)
+        index.c_to_g('c.123+5')   ->  genomic position, e.g. 93995
+        index.g_to_c(93995)       ->  'c.123+5'
+
+    c. positions may be in the CDS (c.123), before it (c.-20), after the
+    stop codon (c.*40) and intronic relative to any of those (c.123+5,
+    c.-20-3, c.*40+1). A genomic position in an intron is given from the
+    nearer exon, the middle base of an odd length intron from the exon
+    before it, as HGVS describes. Genomic positions are those of the LRG
+    (or the GenBank record), counting from 1. Positions before or after the
+    transcript carry on the c.- and c.* numbering. convert takes a mixed
+    batch of c. and g. positions:
+
+        python -m coordinate_index input/LRG_292.xml c.123+5 c.-20 'c.*40' g.93888
+        python -m coordinate_index BRCA1 --transcript NM_007294.3 --file positions.txt
+'''
+
+c_position = re.compile(r'^(?:c\.)?([-*]?)(\d+)(?:([-+])(\d+))?$')
+g_position = re.compile(r'^(?:g\.)?(\d+)$')
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+def parse_c(text):
+    """
+    :param text: a c. position, e.g. c.123, c.123+5, c.-20 or c.*40 ('c.' may be left off)
+    :return: (region, number, offset); region is '' in the CDS, '-' before it and '*' after
+             the stop codon, and offset is the intronic offset, 0 for an exonic base
+    :raises ValueError: if the text is not a c. position
+    """
+    match = c_position.match(text.strip())
+    if match is None or int(match.group(2)) == 0:
+        raise ValueError('%s is not a c. position' % text)
+    region, number, sign, offset = match.groups()
+    offset = int(offset or 0)
+    if sign == '-':
+        offset = -offset
+    return region, int(number), offset
+
+
+def format_c(region, number, offset=0):
+    """ The c. position for the parts returned by parse_c """
+    text = 'c.%s%d' % (region, number)
+    if offset:
+        text += '%+d' % offset
+    return text
+
+
+class TranscriptIndex:
+    """
+    c. to genomic mapping for one transcript, each lookup being a bisect over the exons
+    """
+
+    def __init__(self, exons, cds_start, cds_end):
+        """
+        :param exons: (genomic start, genomic end) of each exon in transcript order, counting
+                      from 1 and including both ends
+        :param cds_start: spliced position (from 0) of c.1
+        :param cds_end: spliced position of c.*1, the first base after the stop codon
+        :raises ValueError: if the exons overlap or are not in order
+        """
+        self.starts = []
+        self.ends = []
+        self.spliced_starts = []
+        spliced = 0
+        for start, end in exons:
+            if self.ends and start <= self.ends[-1]:
+                raise ValueError('exon %d-%d overlaps or comes before the exon before it' % (start, end))
+            self.starts.append(start)
+            self.ends.append(end)
+            self.spliced_starts.append(spliced)
+            spliced += end - start + 1
+        self.length = spliced
+        self.cds_start = cds_start
+        self.cds_end = cds_end
+
+    @classmethod
+    def from_transcript(cls, transcript, file_type='lrg'):
+        """
+        Builds the index for one transcript of the parser output, numbered as the Reader numbers it
+        :param file_type: 'gbk' for GenBank, whose exon starts count from 0
+        :raises ValueError: if exon labels such as 4a and 4c were both read as exon 4, which
+                            keeps the coordinates of only one of them
+        """
+        exon_list = transcript['list_of_exons']
+        if len(set(exon_list)) != len(exon_list):
+            repeated = sorted(set(exon for exon in exon_list if exon_list.count(exon) > 1))
+            raise ValueError('more than one exon is labelled as exon %s' % ', '.join(map(str, repeated)))
+        shift = 1 if file_type == 'gbk' else 0
+        exons = [(transcript['exons'][exon_number]['genomic_start'] + shift,
+                  transcript['exons'][exon_number]['genomic_end'])
+                 for exon_number in exon_list]
+        cds_start = transcript['cds_offset']
+        return cls(exons, cds_start, cds_start + 3 * (len(transcript['protein_seq']) - 1))
+
+    def spliced_to_c(self, spliced):
+        """ :return: (region, number) of a spliced position, as for parse_c """
+        if spliced < self.cds_start:
+            return '-', self.cds_start - spliced
+        if spliced < self.cds_end:
+            return '', spliced - self.cds_start + 1
+        return '*', spliced - self.cds_end + 1
+
+    def c_to_spliced(self, region, number):
+        if region == '-':
+            return self.cds_start - number
+        if region == '*':
+            return self.cds_end + number - 1
+        if self.cds_start + number - 1 >= self.cds_end:
+            raise ValueError('c.%d is after the stop codon (c.%d), which is numbered with c.*' %
+                             (number, self.cds_end - self.cds_start))
+        return self.cds_start + number - 1
+
+    def c_to_g(self, position):
+        """
+        :param position: a c. position as taken by parse_c, or the (region, number, offset) it returns
+        :return: the genomic position
+        :raises ValueError: for an intronic offset which is not from the edge of an exon into its
+                            intron, or which runs past the end of the intron
+        """
+        if isinstance(position, basestring):
+            position = parse_c(position)
+        region, number, offset = position
+        spliced = self.c_to_spliced(region, number)
+        if spliced < 0:
+            exon = None
+            genomic = self.starts[0] + spliced
+        elif spliced >= self.length:
+            exon = None
+            genomic = self.ends[-1] + spliced - self.length + 1
+        else:
+            exon = bisect_right(self.spliced_starts, spliced) - 1
+            genomic = self.starts[exon] + spliced - self.spliced_starts[exon]
+        if offset > 0:
+            if exon is None or genomic != self.ends[exon] or exon == len(self.ends) - 1:
+                raise ValueError('%s is not the last base of an exon before an intron' % format_c(region, number))
+            if genomic + offset >= self.starts[exon + 1]:
+                raise ValueError('%s is past the end of the intron' % format_c(region, number, offset))
+        elif offset < 0:
+            if exon is None or genomic != self.starts[exon] or exon == 0:
+                raise ValueError('%s is not the first base of an exon after an intron' % format_c(region, number))
+            if genomic + offset <= self.ends[exon - 1]:
+                raise ValueError('%s is before the start of the intron' % format_c(region, number, offset))
+        return genomic + offset
+
+    def g_to_c(self, genomic):
+        """
+        :param genomic: genomic position, counting from 1
+        :return: the c. position, e.g. 'c.123+5'
+        """
+        exon = bisect_right(self.starts, genomic) - 1
+        offset = 0
+        if exon < 0:
+            spliced = genomic - self.starts[0]
+        elif genomic <= self.ends[exon]:
+            spliced = self.spliced_starts[exon] + genomic - self.starts[exon]
+        elif exon == len(self.starts) - 1:
+            spliced = self.length - 1 + genomic - self.ends[exon]
+        else:
+            # In the intron after this exon; the middle base of an odd length intron goes with this exon
+            after = genomic - self.ends[exon]
+            before = self.starts[exon + 1] - genomic
+            if after <= before:
+                spliced = self.spliced_starts[exon + 1] - 1
+                offset = after
+            else:
+                spliced = self.spliced_starts[exon + 1]
+                offset = -before
+        region, number = self.spliced_to_c(spliced)
+        return format_c(region, number, offset)
+
+    def convert(self, positions):
+        """
+        Converts a batch of positions: c. positions to genomic, and genomic positions (numbers,
+        or text such as '93888' or 'g.93888') to c.
+        :return: list of (position, converted, error) tuples, converted being None and error
+                 the reason for any position which could not be converted
+        """
+        results = []
+        for position in positions:
+            try:
+                if isinstance(position, (int, long)):
+                    results.append((position, self.g_to_c(position), None))
+                    continue
+                match = g_position.match(position.strip())
+                if match is not None:
+                    results.append((position, self.g_to_c(int(match.group(1))), None))
+                else:
+                    results.append((position, self.c_to_g(position), None))
+            except ValueError as error:
+                results.append((position, None, str(error)))
+        return results
+
+
+class CoordinateIndex:
+    """
+    A TranscriptIndex for each transcript of a gene, found by number or NM accession
+    """
+
+    def __init__(self, dictionary, file_type='lrg'):
+        """
+        :param dictionary: the parser output (see referencer.parse_file)
+        :param file_type: 'lrg' or 'gbk', as given by referencer.check_file_type
+        """
+        self.genename = dictionary['genename']
+        self.transcripts = {}
+        self.accessions = {}
+        self.problems = {}
+        for number, transcript in dictionary['transcripts'].items():
+            if 'NM_number' in transcript:
+                self.accessions[transcript['NM_number'].upper()] = number
+            try:
+                self.transcripts[number] = TranscriptIndex.from_transcript(transcript, file_type)
+            except ValueError as error:
+                self.problems[number] = str(error)
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    def transcript(self, key):
+        """
+        :param key: transcript number (1 or 't1') or NM accession
+        :return: the TranscriptIndex for the transcript
+        :raises ValueError: if there is no such transcript, or it could not be indexed
+        """
+        key = str(key).strip()
+        if key.upper() in self.accessions:
+            number = self.accessions[key.upper()]
+        else:
+            try:
+                number = int(key.lstrip('tT'))
+            except ValueError:
+                number = None
+        if number in self.problems:
+            raise ValueError('Transcript %s of %s cannot be indexed: %s' % (key, self.genename, self.problems[number]))
+        if number not in self.transcripts:
+            raise ValueError('%s has no transcript %s' % (self.genename, key))
+        return self.transcripts[number]
+
+
+def load_index(input_name, input_dir='input'):
+    """
+    Parses an input file, or the LRG for a gene symbol found in input_dir, for its coordinates
+    :return: CoordinateIndex for the gene
+    """
+    from referencer import check_file_type, parse_file, find_gene, default_padding
+    file_name = input_name
+    if not os.path.exists(file_name):
+        matches = find_gene(input_name, input_dir)
+        if not matches:
+            raise ValueError('%s is not a file or a gene in %s' % (input_name, input_dir))
+        file_name = matches[0]
+    file_type = check_file_type(file_name)
+    # The parsers report progress on stdout, which here holds the results
+    saved_stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        dictionary, parser_details = parse_file(file_name, file_type, default_padding, True, mapped=True)
+    finally:
+        sys.stdout = saved_stdout
+    return CoordinateIndex(dictionary, file_type)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Convert c. positions to genomic positions and back')
+    arg_parser.add_argument('input', help='LRG or GenBank file, or a gene symbol to find in --input-dir')
+    arg_parser.add_argument('positions', nargs='*', help='c. positions (c.123+5) or genomic positions (g.93888)')
+    arg_parser.add_argument('--transcript', default='1', help='transcript number or NM accession (default 1)')
+    arg_parser.add_argument('--file', dest='position_file', default=None,
+                            help='file of positions, one per line, or - for standard input')
+    arg_parser.add_argument('--input-dir', default='input')
+    # Positions given after an option are left over by argparse, so are gathered up here
+    args, extra = arg_parser.parse_known_args(argv)
+    unknown = [argument for argument in extra if argument.startswith('--')]
+    if unknown:
+        arg_parser.error('unrecognized arguments: ' + ' '.join(unknown))
+
+    positions = list(args.positions) + extra
+    if args.position_file:
+        handle = sys.stdin if args.position_file == '-' else open(args.position_file)
+        positions.extend(line.strip() for line in handle if line.strip())
+    try:
+        index = load_index(args.input, args.input_dir).transcript(args.transcript)
+    except ValueError as error:
+        arg_parser.error(str(error))
+    failed = False
+    for position, converted, error in index.convert(positions):
+        if error is None:
+            if isinstance(converted, (int, long)):
+                converted = 'g.%d' % converted
+            print '%s\t%s' % (position, converted)
+        else:
+            failed = True
+            print '%s\tERROR: %s' % (position, error)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import copy
+import cPickle
+import hashlib
+import os
+import shutil
+import tempfile
+import zlib
+
+from LrgParser import __version__ as lrg_version
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Size-bounded on-disk caches used to avoid repeating work between runs
+
+    DiskCache stores values as compressed pickles, one file per key, in a
+    single directory. Reading an entry refreshes its modification time, and
+    whenever an entry is stored the least recently used entries are removed
+    until the directory fits within the size limit
+
+    ParseCache keys the parser output on the content of the input file and
+    on every option which changes what the parser returns
+
+    PdfCache keeps the typeset PDF for each distinct TeX file, so unchanged
+    references are copied from the cache rather than run through pdflatex
+
+    RenderState records the primer annotations each transcript was last
+    rendered with, so that after a primer CSV is edited only the transcripts
+    whose exons gained or lost annotations are rendered again
+'''
+
+default_max_bytes = 256 * 1024 * 1024
+
+
+def replace_file(source, destination):
+    """
+    Renames source to destination, replacing any file already there. os.rename will
+    not replace an existing file under Windows, so there the old file is removed and
+    the rename tried again
+    """
+    try:
+        os.rename(source, destination)
+    except OSError:
+        if os.name != 'nt' or not os.path.exists(destination):
+            raise
+        os.remove(destination)
+        os.rename(source, destination)
+
+
+class DiskCache:
+
+    def __init__(self, directory, max_bytes=default_max_bytes, suffix='.pkz'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    @staticmethod
+    def hash_file(file_name):
+        """ SHA1 of a file's contents, read in blocks """
+        digest = hashlib.sha1()
+        with open(file_name, 'rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), ''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, key):
+        """
+        :return: the stored value, or None if the key is absent or unreadable
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as handle:
+                value = cPickle.loads(zlib.decompress(handle.read()))
+        except (IOError, OSError):
+            return None
+        except (zlib.error, cPickle.UnpicklingError, EOFError, ValueError):
+            # Damaged entry, drop it and treat as a miss
+            self.remove(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def store(self, key, value):
+        """ Writes the value atomically, then trims the cache back within its limit """
+        data = zlib.compress(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as out:
+            out.write(data)
+        replace_file(temp_path, self.path(key))
+        self.evict()
+
+    def store_file(self, key, source):
+        """ As store, for a file which is copied into the cache unchanged """
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(handle)
+        shutil.copyfile(source, temp_path)
+        replace_file(temp_path, self.path(key))
+        self.evict()
+
+    def fetch_file(self, key, destination):
+        """
+        Copies a file stored with store_file to destination
+        :return: True if the key was present
+        """
+        path = self.path(key)
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(destination) or '.', suffix='.tmp')
+        os.close(handle)
+        try:
+            shutil.copyfile(path, temp_path)
+        except (IOError, OSError):
+            self.remove(temp_path)
+            return False
+        replace_file(temp_path, destination)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return True
+
+    def evict(self):
+        """ Removes least recently used entries until the total size is within max_bytes """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ParseCache(DiskCache):
+    """
+    Caches the transcript dictionary produced by LrgParser/GbkParser
+
+    Entries are keyed on the SHA1 of the input file, the padding, the flank
+    trimming option and the parser version, so any change to the file or to
+    the parser invalidates them. A parse restricted to some transcripts or
+    exons is kept separately from the full parse. The ElementTree and SeqRecord handles are
+    removed from the dictionary before it is stored
+    """
+
+    handle_keys = ('root', 'fixannot', 'updatable', 'input', 'full genomic sequence')
+
+    def make_key(self, file_name, file_type, padding, trim_flanking, transcripts=None, exon_range=None):
+        if file_type == 'gbk':
+            from GbkParser import __version__ as parser_version
+        else:
+            parser_version = lrg_version
+        details = '{0}|{1}|{2}|{3}|{4}'.format(self.hash_file(file_name), file_type, int(padding),
+                                              bool(trim_flanking), parser_version)
+        if transcripts is not None or exon_range is not None:
+            details += '|{0}|{1}'.format(transcripts and sorted(transcripts), exon_range)
+        return hashlib.sha1(details).hexdigest()
+
+    @classmethod
+    def strip_handles(cls, dictionary):
+        """ A shallow copy of the parser output (a dict or records.Gene) without the handles """
+        stripped = copy.copy(dictionary)
+        for key in cls.handle_keys:
+            stripped.pop(key, None)
+        return stripped
+
+
+class PdfCache(DiskCache):
+    """
+    Caches typeset PDFs, keyed on the SHA1 of the TeX which produced them
+
+    The lines holding \\today and the username (pdfauthor) are left out of the
+    key, so rerunning an unchanged reference on another day or as another
+    user reuses the earlier PDF, including the date and author it was built with
+    """
+
+    volatile_markers = ('\\today', '\\hypersetup{pdfauthor=')
+
+    def __init__(self, directory, max_bytes=default_max_bytes):
+        DiskCache.__init__(self, directory, max_bytes, suffix='.pdf')
+
+    @classmethod
+    def make_key(cls, latex_file):
+        digest = hashlib.sha1()
+        with open(latex_file) as handle:
+            for line in handle:
+                if not any(marker in line for marker in cls.volatile_markers):
+                    digest.update(line)
+        return digest.hexdigest()
+
+
+class RenderState(DiskCache):
+    """
+    For each input file, gene and set of render options, the primer annotation
+    signature of every transcript at its last render and the files it produced
+
+    A transcript whose signature is unchanged and whose files are all still in
+    place does not need rendering again; the parse cache covers the parse itself
+    """
+
+    def __init__(self, directory, max_bytes=default_max_bytes):
+        DiskCache.__init__(self, directory, max_bytes, suffix='.state')
+
+    @staticmethod
+    def make_key(input_hash, genename, options):
+        """
+        :param input_hash: hash_file of the input file
+        :param options: sequence of every value which changes the rendered output
+        """
+        details = '|'.join([input_hash, genename] + [repr(option) for option in options])
+        return hashlib.sha1(details).hexdigest()
+
+    @staticmethod
+    def annotation_signature(transcript):
+        """ The primer spans of every exon of a transcript, in exon order """
+        return tuple((exon_number, tuple(exon.get('annotations', ())))
+                     for exon_number, exon in sorted(transcript['exons'].items()))
+
+    @staticmethod
+    def reusable(previous, transcript, signature):
+        """
+        :param previous: the stored state, mapping transcript to (signature, output files)
+        :return: the earlier output files if they can be kept as they are, otherwise None
+        """
+        if transcript not in previous:
+            return None
+        old_signature, outputs = previous[transcript]
+        if old_signature != signature or not all(os.path.exists(output) for output in outputs):
+            return None
+        return outputs
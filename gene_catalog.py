@@ -0,0 +1,238 @@
+import argparse
+import cPickle
+import os
+import sys
+import tempfile
+try:
+    from xml.etree.cElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+from disk_cache import replace_file
+from mapped_sequence import MappedSequence
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Catalogue of the genes held in the LRG files of the input directory
+
+    The input files are named by LRG number, so finding the file for a gene
+    used to mean parsing each in turn. scan_lrg reads just the header of an
+    LRG in one iterparse pass: the sequence source, the fixed transcripts
+    and their exon counts, then the updatable annotation up to the lrg_locus
+    and the NCBI set with the NM and NP accessions, where it stops. The
+    genomic sequence text is skipped (see mapped_sequence.py) and only its
+    length is kept.
+
+    A GeneCatalog holds the scan of every LRG in a directory, saved to a
+    single file. Opening it again rescans only the files which have been
+    added or changed since (by size and modification time), so it can be
+    opened for every lookup:
+
+        GeneCatalog.open('input').find('BRCA1')  ->  ['input/LRG_292.xml']
+
+        python -m gene_catalog input/ [--find BRCA1]
+'''
+
+default_catalog_name = 'gene_catalog.pkl'
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+def exon_number(label):
+    """ Exon labels such as '12a' are counted under their number, as LrgParser does """
+    if label[-1] in ('a', 'b', 'c', 'd'):
+        label = label[:-1]
+    return int(label)
+
+
+def scan_lrg(file_name):
+    """
+    Reads the catalogue details of one LRG, stopping once the NCBI accessions are read
+    :return: dictionary of genename, refseqname, sequence_length and transcripts, the
+             last mapping each transcript number to its exon count and NM/NP accessions
+    """
+    entry = {'genename': None, 'refseqname': None, 'sequence_length': 0, 'transcripts': {}}
+    try:
+        mapped = MappedSequence(file_name)
+    except ValueError:
+        mapped = None
+        source = file_name
+    else:
+        source = mapped.xml_source()
+        entry['sequence_length'] = len(mapped)
+    try:
+        path = []
+        elements = []
+        for event, element in iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                path.append(element.tag)
+                elements.append(element)
+                continue
+
+            finished = False
+            if path[1:] == ['fixed_annotation', 'sequence_source']:
+                entry['refseqname'] = element.text
+            elif path[1:] == ['fixed_annotation', 'sequence'] and mapped is None:
+                entry['sequence_length'] = len(element.text or '')
+            elif path[1:] == ['fixed_annotation', 'transcript']:
+                exons = set(exon_number(exon.attrib['label']) for exon in element.iter('exon'))
+                entry['transcripts'][int(element.attrib['name'][1:])] = {'exons': len(exons)}
+            elif path[1:] == ['updatable_annotation', 'annotation_set', 'lrg_locus']:
+                if entry['genename'] is None:
+                    entry['genename'] = element.text
+            elif path[1:] == ['updatable_annotation', 'annotation_set']:
+                if element.attrib.get('type') == 'ncbi':
+                    read_accessions(element, entry['transcripts'])
+                    finished = entry['genename'] is not None
+
+            path.pop()
+            elements.pop()
+            if finished:
+                break
+            # Discard completed blocks directly below fixed/updatable annotation
+            if 1 <= len(path) <= 2:
+                elements[-1].remove(element)
+    finally:
+        if mapped is not None:
+            mapped.close()
+    if entry['genename'] is None:
+        raise ValueError('%s has no lrg_locus' % file_name)
+    return entry
+
+
+def read_accessions(annotation_set, transcripts):
+    """ As LrgParser.get_set_accessions, adding NM_number and NP_number to the transcripts """
+    features = annotation_set.find('features')
+    if features is None:
+        return
+    for gene in features.findall('gene'):
+        for transcript_block in gene.findall('transcript'):
+            fixed_id = transcript_block.attrib.get('fixed_id')
+            if fixed_id is None or int(fixed_id[1:]) not in transcripts:
+                continue
+            details = transcripts[int(fixed_id[1:])]
+            details['NM_number'] = transcript_block.attrib['accession']
+            protein_block = transcript_block.find('protein_product')
+            if protein_block is not None and protein_block.attrib.get('fixed_id', '')[1:] == fixed_id[1:]:
+                details['NP_number'] = protein_block.attrib['accession']
+
+
+class GeneCatalog:
+
+    def __init__(self, directory):
+        self.directory = directory
+        # File name -> (size, modification time, scan_lrg entry)
+        self.files = {}
+        self.problems = []
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    def update(self):
+        """
+        Scans any LRG which is new or has changed, and drops any which has gone
+        :return: True if the catalogue changed
+        """
+        files = {}
+        changed = False
+        self.problems = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.xml'):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            known = self.files.get(name)
+            if known is not None and known[:2] == (stat.st_size, stat.st_mtime):
+                files[name] = known
+                continue
+            changed = True
+            try:
+                files[name] = (stat.st_size, stat.st_mtime, scan_lrg(os.path.join(self.directory, name)))
+            except (SyntaxError, ValueError, KeyError, IndexError, IOError) as error:
+                self.problems.append('%s: %s' % (name, error))
+        changed = changed or set(files) != set(self.files)
+        self.files = files
+        return changed
+
+    def entries(self):
+        """
+        :return: list of (file path, entry) pairs, in file name order
+        """
+        return [(os.path.join(self.directory, name), self.files[name][2]) for name in sorted(self.files)]
+
+    def find(self, genename):
+        """
+        :return: list of the LRG files for a gene symbol, ignoring case
+        """
+        genename = genename.upper()
+        return [path for path, entry in self.entries() if entry['genename'].upper() == genename]
+
+    def save(self, catalog_file):
+        """ Writes the catalogue to a single file, replacing any earlier one atomically """
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(catalog_file)), suffix='.tmp')
+        with os.fdopen(handle, 'wb') as out:
+            cPickle.dump(self, out, cPickle.HIGHEST_PROTOCOL)
+        replace_file(temp_path, catalog_file)
+
+    @classmethod
+    def open(cls, directory, catalog_file=None):
+        """
+        Returns the catalogue of a directory, brought up to date. It is read from
+        catalog_file (by default gene_catalog.pkl in the directory), and saved back
+        there if any file had to be scanned
+        """
+        if catalog_file is None:
+            catalog_file = os.path.join(directory, default_catalog_name)
+        catalog = None
+        if os.path.exists(catalog_file):
+            try:
+                with open(catalog_file, 'rb') as index:
+                    catalog = cPickle.load(index)
+                if catalog.directory != directory:
+                    catalog = None
+            except (cPickle.UnpicklingError, EOFError, AttributeError, ValueError, IOError, OSError):
+                catalog = None
+        if catalog is None:
+            catalog = cls(directory)
+        if catalog.update():
+            for problem in catalog.problems:
+                print 'Not catalogued: ' + problem
+            try:
+                catalog.save(catalog_file)
+            except (IOError, OSError) as error:
+                print 'The gene catalogue could not be saved: %s' % error
+        return catalog
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='List the genes held in a directory of LRG files')
+    arg_parser.add_argument('directory', nargs='?', default='input')
+    arg_parser.add_argument('--catalog', default=None, help='catalogue file, defaults to one in the directory')
+    arg_parser.add_argument('--find', default=None, help='only list the files for this gene symbol')
+    args = arg_parser.parse_args(argv)
+
+    catalog = GeneCatalog.open(args.directory, args.catalog)
+    found = 0
+    for path, entry in catalog.entries():
+        if args.find and entry['genename'].upper() != args.find.upper():
+            continue
+        found += 1
+        transcripts = ', '.join('t%d %s (%d exons)' % (number, details.get('NM_number', '-'), details['exons'])
+                                for number, details in sorted(entry['transcripts'].items()))
+        print '%-10s %-14s %-14s %9d bp  %s' % (entry['genename'], os.path.basename(path), entry['refseqname'],
+                                                entry['sequence_length'], transcripts)
+    return 0 if found else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
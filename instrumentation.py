@@ -0,0 +1,93 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Timing and counters for a single run of the pipeline
+
+    A RunRecord is filled in by referencer.render_file as it goes: each
+    stage (parse, primers, render, write, typeset) is timed with
+
+        with record.stage('parse'):
+            ...
+
+    and counters (exons, bases, primer hits, codon mismatches, clash
+    warnings) are added with record.count. When the run ends the record is
+    appended as one line of JSON to the metrics file, so a file collects one
+    record per gene rendered and can be read back with read_records
+'''
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+class RunRecord:
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.details = {}
+        self.success = False
+        self.error = ''
+
+    @contextmanager
+    def stage(self, name):
+        """ Adds the time taken by the enclosed block to the named stage """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.time() - start
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def note(self, name, value):
+        """ Records a single descriptive value, e.g. the gene name """
+        self.details[name] = value
+
+    def finish(self, success, error=''):
+        self.success = success
+        self.error = error
+
+    def as_dict(self):
+        record = {'file': self.file_name,
+                  'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                  'seconds': time.time() - self.started,
+                  'success': self.success,
+                  'error': self.error,
+                  'stages': self.stages,
+                  'counters': self.counters}
+        record.update(self.details)
+        return record
+
+    def write(self, metrics_file):
+        """
+        Appends the record to the metrics file as a single line of JSON. The line is
+        written with one call on a file opened for appending, so records from
+        concurrent batch workers do not interleave
+        """
+        line = json.dumps(self.as_dict(), sort_keys=True) + '\n'
+        handle = os.open(metrics_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0666)
+        try:
+            os.write(handle, line)
+        finally:
+            os.close(handle)
+
+
+def read_records(metrics_file):
+    """
+    :return: list of the record dictionaries in a metrics file
+    """
+    with open(metrics_file) as records:
+        return [json.loads(line) for line in records if line.strip()]
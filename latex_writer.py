@@ -1,5 +1,7 @@
 import os
+import tempfile
 import time
+from disk_cache import replace_file
 
 __author__ = 'mwelland'
 __version__ = 1.3
@@ -12,6 +14,12 @@ __version_date__ = '11/02/2015'
     output
 """
 
+buffer_size = 1 << 16
+# The umask can only be read by setting it, so it is read once here, before any
+# writer threads start, rather than changed for the whole process on every write
+UMASK = os.umask(0)
+os.umask(UMASK)
+
 class LatexWriter:
 
     def __init__(self):
@@ -26,28 +34,75 @@ class LatexWriter:
         return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
 
     def run(self, input_list, filename, write_as_latex):
-        self.write_as_latex = write_as_latex
         self.input_list = input_list
-        self.filename = filename
-        
-        if self.write_as_latex:
-            self.outfile_name = self.filename+'_'+time.strftime("%d-%m-%Y")+\
-                            '_'+time.strftime("%H-%M-%S")+'.tex'
-            self.pdfname = self.filename+'_'+time.strftime("%d-%m-%Y")+\
-                            '_'+time.strftime("%H-%M-%S")+'.pdf'
+        self.open_stream(os.path.dirname(filename))
+        self.fill_output_file()
+        return self.close_stream(filename, write_as_latex)
+
+    def output_names(self, filename, write_as_latex):
+        """
+        :return: the output file name and, for LaTeX, the name of the PDF it will produce
+        """
+        stamp = time.strftime("%d-%m-%Y")+'_'+time.strftime("%H-%M-%S")
+        if write_as_latex:
+            return filename+'_'+stamp+'.tex', filename+'_'+stamp+'.pdf'
         else:
-            self.outfile_name = self.filename+'_'+time.strftime("%d-%m-%Y")+\
-                            '_'+time.strftime("%H-%M-%S")+ '.txt'
+            return filename+'_'+stamp+'.txt', None
+
+    def open_stream(self, directory):
+        """
+        Opens a temporary file in the output directory. Lines passed to write_line
+        are collected into large blocks before being written, and the file is
+        only given its final name by close_stream, so a part-written file is
+        never left behind under an output name
+        """
+        handle, self.temp_name = tempfile.mkstemp(dir=directory or '.', suffix='.part')
+        self.out = os.fdopen(handle, 'w')
+        self.pending = []
+        self.pending_size = 0
+
+    def write_line(self, line):
+        self.pending.append(line)
+        self.pending.append('\n')
+        self.pending_size += len(line) + 1
+        if self.pending_size >= buffer_size:
+            self.flush_pending()
+
+    def flush_pending(self):
+        self.out.write(''.join(self.pending))
+        self.pending = []
+        self.pending_size = 0
 
-        out = open(self.outfile_name, "w")
-        self.fill_output_file(out)
+    def close_stream(self, filename, write_as_latex):
+        """
+        Writes out the remaining lines, closes the file and renames it into place
+        :return: as run, the .tex and .pdf names for LaTeX or the .txt name
+        """
+        self.write_as_latex = write_as_latex
+        self.filename = filename
+        self.flush_pending()
+        self.out.close()
+        self.outfile_name, self.pdfname = self.output_names(filename, write_as_latex)
+        self.place_file(self.outfile_name)
+        print 'File written'
         if self.write_as_latex:
             return self.outfile_name, self.pdfname
         else:
             return self.outfile_name
 
-    def fill_output_file(self, out):
+    def place_file(self, final_name):
+        """ Renames the finished temporary file to its output name """
+        # mkstemp creates the file as owner-only, give it the usual permissions
+        os.chmod(self.temp_name, 0666 & ~UMASK)
+        replace_file(self.temp_name, final_name)
+
+    def abort_stream(self):
+        """ Discards a partly written output file after a failure """
+        self.out.close()
+        if os.path.exists(self.temp_name):
+            os.remove(self.temp_name)
+
+    def fill_output_file(self):
 
         for line in self.input_list:
-            print >> out, line
-        print 'File written'
\ No newline at end of file
+            self.write_line(line)
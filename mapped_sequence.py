@@ -0,0 +1,117 @@
+import mmap
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Serves the genomic sequence of an LRG file straight from the file
+
+    The fixed_annotation <sequence> of an LRG is one long line of text, and
+    for megabase loci it is by far the largest thing the parser holds. A
+    MappedSequence finds the byte range of that text once and memory maps
+    the file, so that
+
+        genseq[start:end]
+
+    returns just that window as a string, exactly as slicing the full
+    sequence string would; only the exon and flank windows which are asked
+    for are ever copied into memory. xml_source gives a file-like view of
+    the LRG with the sequence text left out, for ElementTree to parse in
+    place of the file itself
+'''
+
+check_chunk = 1 << 20
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+class MappedSequence:
+    """
+    Slices of the fixed annotation sequence of an LRG file, read through mmap.
+    Raises ValueError if the sequence cannot be served directly from the file,
+    e.g. if the text is split over several lines
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, 'rb') as handle:
+            self.mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.start, self.end = self.locate()
+            self.check_text()
+        except ValueError:
+            self.close()
+            raise
+
+    def locate(self):
+        """
+        :return: the byte offsets of the start and end of the fixed_annotation/sequence text
+        """
+        fixed = self.mapped.find('<fixed_annotation')
+        if fixed == -1:
+            raise ValueError('%s has no fixed_annotation' % self.file_name)
+        tag = self.mapped.find('<sequence>', fixed)
+        first_transcript = self.mapped.find('<transcript', fixed)
+        if tag == -1 or -1 < first_transcript < tag:
+            raise ValueError('%s has no fixed_annotation sequence' % self.file_name)
+        start = tag + len('<sequence>')
+        end = self.mapped.find('</sequence>', start)
+        if end == -1:
+            raise ValueError('%s has an unterminated sequence' % self.file_name)
+        return start, end
+
+    def check_text(self):
+        """ The text must be bases alone, with no whitespace or entities, for offsets to line up """
+        for position in xrange(self.start, self.end, check_chunk):
+            chunk = self.mapped[position:min(position + check_chunk, self.end)]
+            if not chunk.isalpha():
+                raise ValueError('%s sequence is not a single line of bases' % self.file_name)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('only contiguous slices of the sequence are supported')
+            return self.mapped[self.start + start:self.start + max(start, stop)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('sequence index out of range')
+        return self.mapped[self.start + index]
+
+    def xml_source(self):
+        """ A file-like view of the LRG file without the sequence text, for ElementTree """
+        return SkippingReader(self.mapped, self.start, self.end)
+
+    def close(self):
+        self.mapped.close()
+
+
+class SkippingReader:
+    """ Reads a memory mapped file as a stream, leaving out the bytes from skip_start to skip_end """
+
+    def __init__(self, mapped, skip_start, skip_end):
+        self.mapped = mapped
+        self.skip_start = skip_start
+        self.skip_end = skip_end
+        self.position = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self.mapped)
+        if self.skip_start <= self.position < self.skip_end:
+            self.position = self.skip_end
+        stop = self.position + size
+        if self.position < self.skip_start < stop:
+            stop = self.skip_start
+        data = self.mapped[self.position:stop]
+        self.position += len(data)
+        return data
@@ -0,0 +1,259 @@
+import re
+import time
+import zlib
+from latex_writer import LatexWriter
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Writes the Reader's LaTeX output straight to a PDF, without pdflatex
+
+    The PdfWriter takes the same lines as the LatexWriter, one at a time,
+    and lays them out as the LaTeX document would be: the centred title
+    block, the key to the lines, then the alltt sections in a monospaced
+    font. A new page is started wherever the Reader ends an alltt section
+    with \\newpage (see Reader.print_exon_end), and also if a page runs out
+    of room. Primer highlighting (\\hl{...}) becomes a yellow rectangle
+    behind the bases and each \\pdfcomment becomes a PDF text annotation
+    holding the primer label, as pdfcomment would make.
+
+    Each page is written to the file as soon as it is complete, and only
+    the small catalogue objects and cross reference table are left for
+    close_stream. The file is named as the LatexWriter names its PDF
+'''
+
+page_width = 595  # A4, in points
+page_height = 842
+margin = 72
+font_size = 10
+char_width = 0.6 * font_size  # Courier glyphs are 600/1000 of the font size wide
+leading = 12
+title_size = 12
+title_leading = 17
+highlight_colour = '1 1 0'
+
+markup = re.compile(r'\\pdfcomment\[date\]\{([^}]*)\}\\hl\{|\\hl\{|\}')
+ordinal = re.compile(r'\$(\d)\^\{(\w+)\}\$')
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+def pdf_string(text):
+    """ A PDF literal string for the text """
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+def latex_date():
+    """ The date as \\today prints it, e.g. October 17, 2026 """
+    return '%s %d, %d' % (time.strftime('%B'), time.localtime().tm_mday, time.localtime().tm_year)
+
+
+class PdfWriter(LatexWriter):
+    """
+    A LatexWriter which produces the PDF itself. Use open_stream, write_line and
+    close_stream as for the LatexWriter; close_stream returns the PDF name
+    """
+
+    # Object numbers fixed in advance; pages and annotations follow
+    catalog_id = 1
+    pages_id = 2
+    mono_font_id = 3
+    text_font_id = 4
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'PDF Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    def open_stream(self, directory):
+        LatexWriter.open_stream(self, directory)
+        self.position = 0
+        self.offsets = {}
+        self.next_id = self.text_font_id + 1
+        self.page_ids = []
+        self.section = 'preamble'
+        self.author = ''
+        self.title = ''
+        self.date = latex_date()
+        self.stamp = time.strftime('D:%Y%m%d%H%M%S')
+        self.highlight_start = None
+        self.emit('%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.start_page()
+
+    def emit(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        self.emit('%d 0 obj\n%s\nendobj\n' % (object_id, body))
+
+    def write_stream(self, object_id, data):
+        data = zlib.compress(data)
+        self.offsets[object_id] = self.position
+        self.emit('%d 0 obj\n<< /Length %d /Filter /FlateDecode >>\nstream\n' % (object_id, len(data)))
+        self.emit(data)
+        self.emit('\nendstream\nendobj\n')
+
+    def start_page(self):
+        self.y = page_height - margin
+        self.rectangles = []
+        self.text = []
+        self.annotations = []
+
+    def finish_page(self):
+        """ Writes the content stream, annotations and page object of the current page """
+        content = ['%s rg' % highlight_colour]
+        content.extend('%.2f %.2f %.2f %.2f re f' % rectangle for rectangle in self.rectangles)
+        content.append('0 g BT')
+        content.extend(self.text)
+        content.append('ET')
+        content_id = self.new_id()
+        self.write_stream(content_id, '\n'.join(content))
+        annotation_ids = []
+        for x, y, label in self.annotations:
+            annotation_id = self.new_id()
+            self.write_object(annotation_id, '<< /Type /Annot /Subtype /Text /Rect [%.2f %.2f %.2f %.2f] '
+                                             '/Contents %s /T %s /M (%s) /Name /Comment /C [%s] >>' %
+                              (x, y, x + 10, y + 10, pdf_string(label), pdf_string(self.author), self.stamp,
+                               highlight_colour))
+            annotation_ids.append(annotation_id)
+        page_id = self.new_id()
+        self.write_object(page_id, '<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+                                   '/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R '
+                                   '/Annots [%s] >>' %
+                          (self.pages_id, page_width, page_height, self.mono_font_id, self.text_font_id,
+                           content_id, ' '.join('%d 0 R' % annotation for annotation in annotation_ids)))
+        self.page_ids.append(page_id)
+
+    def new_page(self):
+        self.finish_page()
+        self.start_page()
+
+    def advance(self, space):
+        """ Moves down by space, starting a new page if the line would not fit """
+        if self.y - space < margin:
+            self.new_page()
+        self.y -= space
+
+    def place_text(self, text, x, font, size):
+        self.text.append('/%s %d Tf 1 0 0 1 %.2f %.2f Tm %s Tj' % (font, size, x, self.y, pdf_string(text)))
+
+    def clean(self, line):
+        """ Plain text for a title or key line of the LaTeX """
+        line = ordinal.sub(r'\1\2', line.replace('\\today', self.date).replace('\\_', '_'))
+        if line.endswith('\\\\'):
+            line = line[:-2]
+        return line
+
+    def write_line(self, line):
+        """ Lays out one line of the Reader's LaTeX output """
+        if self.section == 'alltt':
+            if line == '\\end{alltt}':
+                self.section = 'between'
+            else:
+                self.alltt_line(line)
+        elif self.section == 'between':
+            if line == '\\newpage':
+                self.new_page()
+            elif line == '\\begin{alltt}':
+                self.section = 'alltt'
+        elif line.startswith('\\hypersetup{pdfauthor={'):
+            self.author = line[len('\\hypersetup{pdfauthor={'):].rstrip(',').rstrip('}')
+        elif line.startswith('pdftitle={'):
+            self.title = line[len('pdftitle={'):].rstrip('}')
+        elif line == '\\begin{large}':
+            self.section = 'title'
+        elif line == '\\end{large}':
+            self.section = 'preamble'
+            self.advance(leading)
+        elif line == '\\begin{alltt}':
+            self.section = 'alltt'
+            self.advance(leading)
+        elif line.startswith('\\'):
+            pass
+        elif self.section == 'title':
+            text = self.clean(line)
+            self.advance(title_leading)
+            self.place_text(text, (page_width - len(text) * 0.6 * title_size) / 2, 'F1', title_size)
+        else:
+            self.advance(leading)
+            self.place_text(self.clean(line), margin, 'F2', font_size)
+
+    def alltt_line(self, line):
+        """ A line of the verbatim section: the bases, with any highlighting and comments """
+        self.advance(leading)
+        pieces = []
+        column = 0
+        cursor = 0
+        for match in markup.finditer(line):
+            pieces.append(line[cursor:match.start()])
+            column += match.start() - cursor
+            cursor = match.end()
+            if match.group(0) == '}':
+                self.close_highlight(column)
+            else:
+                if match.group(1) is not None:
+                    self.annotations.append((margin + column * char_width, self.y + font_size, match.group(1)))
+                self.highlight_start = column
+        pieces.append(line[cursor:])
+        column += len(line) - cursor
+        # Highlighting still open at the end of a line carries on to the next
+        if self.highlight_start is not None:
+            self.close_highlight(column)
+            self.highlight_start = 0
+        self.place_text(''.join(pieces), margin, 'F1', font_size)
+
+    def close_highlight(self, column):
+        if self.highlight_start is not None and column > self.highlight_start:
+            self.rectangles.append((margin + self.highlight_start * char_width, self.y - 2.5,
+                                    (column - self.highlight_start) * char_width, font_size + 1))
+        self.highlight_start = None
+
+    def flush_pending(self):
+        pass
+
+    def close_stream(self, filename, write_as_latex=True):
+        """
+        Finishes the last page, writes the document catalogue and renames the PDF into place
+        :return: the name of the PDF
+        """
+        self.filename = filename
+        self.write_as_latex = True
+        self.finish_page()
+        self.write_object(self.mono_font_id, '<< /Type /Font /Subtype /Type1 /BaseFont /Courier '
+                                             '/Encoding /WinAnsiEncoding >>')
+        self.write_object(self.text_font_id, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                                             '/Encoding /WinAnsiEncoding >>')
+        self.write_object(self.pages_id, '<< /Type /Pages /Kids [%s] /Count %d >>' %
+                          (' '.join('%d 0 R' % page for page in self.page_ids), len(self.page_ids)))
+        self.write_object(self.catalog_id, '<< /Type /Catalog /Pages %d 0 R >>' % self.pages_id)
+        info_id = self.new_id()
+        self.write_object(info_id, '<< /Title %s /Author %s /Producer %s /CreationDate (%s) >>' %
+                          (pdf_string(self.title), pdf_string(self.author),
+                           pdf_string('PdfWriter ' + self.get_version), self.stamp))
+        xref = self.position
+        self.emit('xref\n0 %d\n0000000000 65535 f \n' % self.next_id)
+        for object_id in range(1, self.next_id):
+            self.emit('%010d 00000 n \n' % self.offsets[object_id])
+        self.emit('trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' %
+                  (self.next_id, self.catalog_id, info_id, xref))
+        self.out.close()
+        self.pdfname = self.output_names(filename, True)[1]
+        self.outfile_name = self.pdfname
+        self.place_file(self.pdfname)
+        print 'File written'
+        return self.pdfname
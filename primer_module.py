@@ -1,7 +1,6 @@
-import re
 import os
-import csv
-import Bio
+
+from primer_store import read_primer_csv, reverse_complement
 
 __author__ = 'Matt'
 __version__ = 0.1
@@ -18,6 +17,7 @@ class primer:
         self.primer_files = []
         self.carry_on = False
         self.csv_reader = ''
+        self.primers = []
 
     @property
     def get_version(self):
@@ -39,78 +39,67 @@ class primer:
     def digest_input(self, filename):
         print filename
         #Extract contents of the CSV
-        with open(os.path.join('primers', filename+'.csv')) as csvfile:
-            reader = csv.DictReader(csvfile)
-            exon = 1
-            frag_size = 0
-            for row in reader:
-                if row['Primer Sequences'] == '':
-                    pass
-                else:
-                    seq = row['Primer Sequences'].upper().strip()
-                    if seq == '':
-                        pass
-                    if row['Exon'] != '':
-                        exon = row['Exon']
-                    direction = row['Direction']
-                    if direction == 'R':
-                        seq = self.create_reverse_complement(seq)
-                    if row['Fragment Size'] == '':
-                        if direction == 'R' and frag_size != '':
-                            frag = frag_size
-                            frag_size = ''
-                        else:
-                            frag = ''
-                    else:
-                        frag = row['Fragment Size']
-                        frag_size = frag
-
-                    if row['Primer Batch Numbers'] == '':
-                        row['Primer Batch Numbers'] = 'Unavailable'
-                    if frag == '':
-                        constructed_string = 'Primer %s' % (exon+direction)
-                    else:
-                        constructed_string = 'Primer %s, Frag size = %s' % (exon+direction, frag)
-                    self.search_for_seq(seq, constructed_string)
-
-    def search_for_seq(self, seq, construct):
-    
+        self.primers = read_primer_csv(os.path.join(self.basepath, 'primers', filename+'.csv'))
+        self.search_for_primers()
+
+    def search_for_primers(self):
+        """
+        Labels every primer in every exon sequence using a single automaton built
+        from the whole CSV. Each distinct exon sequence is scanned once, and the
+        result is reused for any other transcript containing the same sequence
+
+        The sequences themselves are left unchanged; the primers are recorded in
+        each exon as a sorted list of (start, end, label) spans under 'annotations'
+        """
+        automaton = PrimerAutomaton([seq for seq, construct in self.primers])
+        labelled = {}
         for transcript in self.dict['transcripts']:
-            exonlist = self.dict['transcripts'][transcript]['exons'].keys()
-            for exon in exonlist:
-                try:
-                    match = re.search(r'(?i)%s' % \
-                        seq, str(self.dict['transcripts'][transcript]['exons'][exon]['sequence']))
-                    if match:
-                        #print self.dict['transcripts'][transcript]['exons'][exon]['sequence']
-                        self.dict['transcripts'][transcript]['exons'][exon]['sequence'] = \
-                                    re.sub(r'(?i)%s' % seq, r'\\pdfcomment[date]{%s}\\hl{%s}' % (construct, match.group()),\
-                                    str(self.dict['transcripts'][transcript]['exons'][exon]['sequence']))
-                        #print self.dict['transcripts'][transcript]['exons'][exon]['sequence']
-                        #this = raw_input()
-                except MemoryError:
-                    print exon
-                    print seq
-                    
-                    
+            exons = self.dict['transcripts'][transcript]['exons']
+            for exon in exons:
+                if 'sequence' not in exons[exon]:
+                    # Outside the exon range being rendered
+                    continue
+                sequence = str(exons[exon]['sequence'])
+                if sequence not in labelled:
+                    labelled[sequence] = self.label_sequence(sequence, automaton)
+                if labelled[sequence]:
+                    exons[exon]['annotations'] = labelled[sequence]
+
+    def label_sequence(self, sequence, automaton):
+        """
+        Finds the primer locations in one sequence
+
+        Primers are placed in CSV order, and a match is skipped where it overlaps
+        a primer which has already been placed
+        :return: sorted list of (start, end, label) spans
+        """
+        matches = {}
+        for start, index in automaton.search(sequence.upper()):
+            matches.setdefault(index, []).append(start)
+        placed = []
+        for index in sorted(matches):
+            length = len(self.primers[index][0])
+            for start in sorted(matches[index]):
+                end = start + length
+                if all(end <= other_start or start >= other_end for other_start, other_end, _ in placed):
+                    placed.append((start, end, self.primers[index][1]))
+        return sorted(placed)
+
     def create_reverse_complement(self, string):
-        new_list = []
-        for x in string:
-            if x == 'A':
-                new_list.append('T')
-            if x == 'C':
-                new_list.append('G')
-            if x == 'G':
-                new_list.append('C')
-            if x == 'T':
-                new_list.append('A')
-        new_string = ''.join(new_list)
-        return new_string[::-1]
-
-    def run(self, dictionary, basepath):
+        return reverse_complement(string)
+
+    def run(self, dictionary, basepath, store=None):
         #This is the main method
         self.dict = dictionary
         self.basepath = basepath
+        if store is not None:
+            # Primers already read and validated by a PrimerStore
+            primers = store.get(self.dict['genename'])
+            if primers is not None:
+                self.carry_on = True
+                self.primers = list(primers)
+                self.search_for_primers()
+            return self.dict
         self.primer_files = os.listdir(os.path.join(self.basepath, 'primers'))
         filename = self.is_primer_present()
         if self.carry_on == True:
@@ -118,3 +107,56 @@ class primer:
             self.digest_input(filename)
         return self.dict
 
+
+class PrimerAutomaton:
+    """
+    Aho-Corasick automaton over a list of primer sequences, so that all primers
+    can be found in a sequence with one linear scan. States are held in parallel
+    lists: goto transitions, failure links and the primer indices ending at each state
+    """
+
+    def __init__(self, patterns):
+        self.lengths = [len(pattern) for pattern in patterns]
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.out[state].append(index)
+        # Breadth first pass to set the failure links
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.out[next_state] = self.out[next_state] + self.out[self.fail[next_state]]
+
+    def search(self, text):
+        """
+        :param text: the sequence to scan, in the same case as the patterns
+        :return: list of (start, pattern index) for every match, overlaps included
+        """
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        lengths = self.lengths
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                for index in out[state]:
+                    matches.append((position - lengths[index] + 1, index))
+        return matches
@@ -0,0 +1,171 @@
+import cPickle
+import csv
+import os
+import tempfile
+from string import maketrans
+from disk_cache import replace_file
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Holds the primers for every gene in the primers/ directory
+
+    Each CSV is read and validated once: sequences are stripped and upper
+    cased, reverse primers are reverse complemented, and every primer is
+    kept as a (sequence, label) pair ready for the primer module's search.
+    Genes are looked up without regard to case, matching the file names.
+
+    For batch runs the store can be saved to a single index file, which is
+    reused for as long as no CSV in the directory has been added, removed
+    or modified, and which is handed to every worker process
+'''
+
+required_columns = ('Exon', 'Direction', 'Primer Sequences', 'Fragment Size')
+complement = maketrans('ACGT', 'TGCA')
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+def reverse_complement(sequence):
+    """ Reverse complement of an upper case sequence; anything but A, C, G or T is dropped """
+    return sequence.translate(complement, ''.join(set(sequence) - set('ACGT')))[::-1]
+
+
+def read_primer_csv(csv_file, problems=None):
+    """
+    Reads one primer CSV into (sequence, label) pairs, in file order
+
+    A fragment size given on a forward primer is repeated on the reverse primer
+    which follows it, and the exon number carries on from the last row giving one
+    :param problems: optional list, which is extended with a description of each
+                     row that cannot be used (these rows are skipped)
+    :return: list of (sequence, label) pairs
+    """
+    if problems is None:
+        problems = []
+    primers = []
+    with open(csv_file) as csvfile:
+        reader = csv.DictReader(csvfile)
+        exon = '1'
+        frag_size = 0
+        for row in reader:
+            missing = [column for column in required_columns if column not in row]
+            if missing:
+                problems.append('%s: missing column %s' % (os.path.basename(csv_file), ', '.join(missing)))
+                return []
+            if not row['Primer Sequences']:
+                continue
+            seq = row['Primer Sequences'].upper().strip()
+            if row['Exon'] != '':
+                exon = row['Exon']
+            direction = row['Direction']
+            valid = not seq.strip('ACGT')
+            if direction == 'R':
+                seq = reverse_complement(seq)
+            if row['Fragment Size'] == '':
+                if direction == 'R' and frag_size != '':
+                    frag = frag_size
+                    frag_size = ''
+                else:
+                    frag = ''
+            else:
+                frag = row['Fragment Size']
+                frag_size = frag
+            if frag == '':
+                constructed_string = 'Primer %s' % (exon+direction)
+            else:
+                constructed_string = 'Primer %s, Frag size = %s' % (exon+direction, frag)
+            if seq == '':
+                continue
+            if not valid:
+                problems.append('%s line %d: primer %s is not a DNA sequence' %
+                                (os.path.basename(csv_file), reader.line_num, row['Primer Sequences']))
+                continue
+            primers.append((seq, constructed_string))
+    return primers
+
+
+class PrimerStore:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.signature = None
+        self.primers = {}
+        self.file_names = {}
+        self.problems = []
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    @staticmethod
+    def gene_key(name):
+        return name.split('.')[0].lower()
+
+    def directory_signature(self):
+        """ Name, size and modification time of every CSV, used to spot a stale index """
+        signature = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.lower().endswith('.csv'):
+                stat = os.stat(os.path.join(self.directory, name))
+                signature.append((name, stat.st_size, stat.st_mtime))
+        return signature
+
+    def load(self):
+        """ Reads and validates every CSV in the directory """
+        self.signature = self.directory_signature()
+        self.primers = {}
+        self.file_names = {}
+        self.problems = []
+        for name, size, mtime in self.signature:
+            key = self.gene_key(name)
+            self.file_names[key] = name.split('.')[0]
+            self.primers[key] = read_primer_csv(os.path.join(self.directory, name), self.problems)
+        return self
+
+    def get(self, genename):
+        """
+        :return: list of (sequence, label) pairs for the gene, or None if it has no CSV
+        """
+        return self.primers.get(self.gene_key(genename))
+
+    def __contains__(self, genename):
+        return self.gene_key(genename) in self.primers
+
+    def save(self, index_file):
+        """ Writes the store to a single index file, replacing any earlier one atomically """
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_file)), suffix='.tmp')
+        with os.fdopen(handle, 'wb') as out:
+            cPickle.dump(self, out, cPickle.HIGHEST_PROTOCOL)
+        replace_file(temp_path, index_file)
+
+    @classmethod
+    def open(cls, directory, index_file=None):
+        """
+        Returns the store for a directory, from index_file if that is up to date,
+        otherwise by reading the CSVs (and then saving a new index_file if given)
+        """
+        if index_file and os.path.exists(index_file):
+            try:
+                with open(index_file, 'rb') as index:
+                    store = cPickle.load(index)
+                if store.directory == directory and store.signature == store.directory_signature():
+                    return store
+            except (cPickle.UnpicklingError, EOFError, AttributeError, ValueError, IOError, OSError):
+                pass
+        store = cls(directory).load()
+        for problem in store.problems:
+            print 'Primer CSV problem: ' + problem
+        if index_file:
+            store.save(index_file)
+        return store
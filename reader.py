@@ -1,4 +1,5 @@
-import re
+from string import ascii_lowercase, ascii_uppercase
+from records import Transcript
 __author__ = 'mwelland'
 __version__ = 1.3
 __version_date__ = '11/02/2015'
@@ -16,6 +17,9 @@ __version_date__ = '11/02/2015'
     variety of assertions to be performed before attempting to
     generate output'''
 
+# Stands in for the bases of exons left unsliced by the parsers' exon range
+unsliced_base = '-'
+
 
 class Reader:
     """
@@ -36,15 +40,19 @@ class Reader:
         self.filename = ''
         self.transcript = ''
         self.output_list = []
+        self.sink = None
         self.amino_printing = False
         self.amino_spacing = False
         self.exon_spacing = False
         self.exon_printed = False
         self.dont_print = False
         self.check_AA = True
+        self.spliced_sequence = ''
+        self.cds_map = {}
+        self.codon_mismatches = []
+        self.clash_warnings = 0
         self.print_clashes = True
         self.line_break_print = False
-        self.pattern = re.compile(r'\\p.*?l{')
         self.found_first_slash = False
         
         # This is a codon-AA dictionary construction created by Peter Collingridge
@@ -173,6 +181,80 @@ class Reader:
 
         return output, codon_count, amino_acid_counter, codon_numbered
 
+    def build_cds_map(self, latex_dict):
+        """
+        :param latex_dict: the dictionary for the current transcript
+
+        Joins the upper case (exonic) bases of every exon into a single spliced
+        sequence, and records for each exon position the index of its first exonic
+        base, the offset of that base within the spliced sequence and the number of
+        exonic bases. The bases of any codon can then be found with a single slice
+
+        Exons left out by the parsers' exon range are counted from their coordinates,
+        so that the numbering of the exons which are printed is unchanged
+        """
+        pieces = []
+        offset = 0
+        self.cds_map = {}
+        for position, exon_number in enumerate(latex_dict['list_of_exons']):
+            if not self.is_selected(latex_dict, position):
+                exonic_length = self.unsliced_length(latex_dict['exons'][exon_number])
+                self.cds_map[position] = (0, offset, exonic_length)
+                pieces.append(unsliced_base * exonic_length)
+                offset += exonic_length
+                continue
+            sequence = str(latex_dict['exons'][exon_number]['sequence'])
+            exonic = sequence.lstrip(ascii_lowercase)
+            first_exonic = len(sequence) - len(exonic)
+            exonic = exonic[:len(exonic) - len(exonic.lstrip(ascii_uppercase))]
+            self.cds_map[position] = (first_exonic, offset, len(exonic))
+            pieces.append(exonic)
+            offset += len(exonic)
+        self.spliced_sequence = ''.join(pieces)
+
+    @staticmethod
+    def is_selected(latex_dict, position):
+        """ False for an exon outside the exon range given to the parser, which has no sequence """
+        return 'sequence' in latex_dict['exons'][latex_dict['list_of_exons'][position]]
+
+    def unsliced_length(self, exon_dict):
+        """ The number of exonic bases in an exon without a sequence, from its coordinates """
+        exonic_length = exon_dict['genomic_end'] - exon_dict['genomic_start']
+        # GenBank starts are 0-based, LRG coordinates include both ends
+        if self.file_type != 'gbk':
+            exonic_length += 1
+        return exonic_length
+
+    def check_codon(self, spliced_position, amino_acid, exon_number, amino_acid_number):
+        """
+        :param spliced_position: position of the first codon base in the spliced sequence
+        :param amino_acid: the amino acid printed for this codon
+        :param exon_number: exon containing the first base, for the report
+        :param amino_acid_number: position of the amino acid in the protein
+
+        Compares the printed amino acid with the translation of the codon, and
+        records any disagreement in self.codon_mismatches
+        """
+        codon = self.spliced_sequence[spliced_position:spliced_position + 3]
+        if unsliced_base in codon:
+            return
+        if self.codon_table.get(codon) != amino_acid:
+            self.codon_mismatches.append((exon_number, amino_acid_number, codon, amino_acid))
+
+    def codon_report(self):
+        """
+        :return: list of strings describing each codon/amino acid mismatch
+        """
+        report = []
+        for exon_number, amino_acid_number, codon, amino_acid in self.codon_mismatches:
+            if codon in self.codon_table:
+                report.append('There is an error with the amino acid - codon pairing in exon %s: %s - %s, AA# %s'
+                              % (exon_number, codon, amino_acid, amino_acid_number))
+            else:
+                report.append("The key '%s' does not have a codon entry: %s, exon %s, AA# %s"
+                              % (codon, self.transcriptdict['genename'], exon_number, amino_acid_number))
+        return report
+
     def print_latex_header(self, refseqid):
         """
         :param refseqid: reference sequence identifier for current input
@@ -234,7 +316,7 @@ class Reader:
             Lengths of numbers calculated using len(#)'''
         protein = latex_dict['protein_seq']
         refseqid = self.transcriptdict['refseqname'].replace('_', '\_')  # Required for LaTex
-        assert isinstance(latex_dict, dict)
+        assert isinstance(latex_dict, (dict, Transcript))
         # A variable to keep a count of the
         # transcript length across all exons
         cds_count = 1 - latex_dict['cds_offset']
@@ -249,7 +331,6 @@ class Reader:
         if self.write_as_LaTex:
             self.print_latex_header(refseqid)
         lines_on_page = 10
-        extra_lines = 0
         wait_value = 0
         codon_count = 3  # Print AA at start of codon
         amino_acid_counter = 0  # Begin at AA index 0 (first)
@@ -257,8 +338,14 @@ class Reader:
         codon_numbered = False  # First AA has not been numbered already
         post_protein_printer = 0  # The number for 3' intron '+###' counting
         exon_list = latex_dict['list_of_exons']
+        self.build_cds_map(latex_dict)
         for position in range(len(exon_list)):
             exon_number = latex_dict['list_of_exons'][position]
+            if not self.is_selected(latex_dict, position):
+                (cds_count, codon_count, amino_acid_counter, codon_numbered,
+                 post_protein_printer) = self.skip_exon(self.cds_map[position][2], protein, cds_count, codon_count,
+                                                        amino_acid_counter, codon_numbered, post_protein_printer)
+                continue
             intron_offset = self.transcriptdict['pad_offset']
             intron_in_padding = self.transcriptdict['pad']
             intron_out = 0  # Or 0?
@@ -270,84 +357,31 @@ class Reader:
             self.amino_spacing = False
             self.exon_spacing = False
             exon_dict = latex_dict['exons'][exon_number]
-            ex_start = exon_dict['genomic_start']
-            ex_end = exon_dict['genomic_end']
-            if self.file_type == 'gbk': ex_start += 1
-            self.line_printer('Exon %s | Start: %s | End: %s | Length: %s' %
-                              (exon_number, str(ex_start), str(ex_end), str(ex_end - ex_start)))
-
-            if self.print_clashes:
-                """ This section allows for a note to be written where the 'intronic' flanking sequence
-                    of an exon contains part of the next exon. This serves to clarify whether any overlap
-                    may take place. This will not impact the printed output
-
-                    A companion segment in the parser classes is responsible for altering the flanking region
-                    if the regions are to avoid overlaps.
-                """
-                clash_after = False
-                clash_before = False
-                if exon_number < len(latex_dict['list_of_exons'])-1:
-                    try:
-                        # next_exon = exon_number+1
-                        if ex_end > latex_dict['exons'][latex_dict['list_of_exons'][position+1]]['genomic_start']-(self.transcriptdict['pad']*2):
-                            clash_after = True
-                    except KeyError:
-                        print 'potential undetected clash after exon ' + str(exon_number)
-                if exon_number > 1:
-                    # prev_exon = exon_number-1
-                    # print exon_number
-                    # print latex_dict['list_of_exons'][exon_index-2]
-                    if exon_number > latex_dict['list_of_exons'][position-1]:
-                        if ex_start < latex_dict['exons'][latex_dict['list_of_exons'][position-1]]['genomic_end']+(self.transcriptdict['pad']*2):
-                            clash_before = True
-                if clash_after is True and clash_before is True:
-                    self.line_printer('BE AWARE: Flanking intron is shared with both adjacent exons')
-                elif clash_after is True:
-                    self.line_printer('BE AWARE: Flanking intron is shared with the following exon')
-                elif clash_before is True:
-                    self.line_printer('BE AWARE: Flanking intron is shared with the previous exon')
+            self.print_exon_details(latex_dict, position)
 
             sequence = exon_dict['sequence']
+            first_exonic, exon_offset, exonic_length = self.cds_map[position]
+            # Primer annotations as sorted (start, end, label) spans over the sequence
+            annotations = exon_dict.get('annotations', [])
+            next_annotation = 0
+            annotation_end = None
             characters_on_line = 0
-            self.line_printer('')
-            pdfannotation_timer = 0
-            for base_position in range(len(sequence)):
+            for base_position in range(len(sequence) + 1):
+                closing = base_position == annotation_end
+                opening = next_annotation < len(annotations) and \
+                    annotations[next_annotation][0] == base_position
+                if base_position == len(sequence) and not closing:
+                    break
 
                 # Stop each line at a specific length
-                if characters_on_line % 60 == 0 and characters_on_line != 0\
-                        and pdfannotation_timer == 0:
-                    amino_was_printed = bool(" ".join(amino_string).strip())
-                    amino_was_numbered = bool(" ".join(amino_number_string).strip())
-
-                    # print lines_on_page
-                    if lines_on_page >= 41:
-                        extra_lines = 2   # Base and numbering strings as default
-                        if amino_was_numbered: extra_lines += 1
-                        if amino_was_printed: extra_lines += 1
-                        # print 'total lines: ' + str((lines_on_page) + extra_lines)
-                        if ((lines_on_page) + extra_lines) >= 45:
-                            if self.write_as_LaTex:
-                                self.print_exon_end()
-                            else:
-                                self.line_printer(' ')
-                                self.line_printer(' ')
-                            lines_on_page = 0
-                    wait_value = 0
-                    amino_wait = 0
-                    self.line_printer(number_string)
+                if characters_on_line % 60 == 0 and characters_on_line != 0:
                     if self.line_break_print:
                         dna_string.append('}')
-                    self.line_printer(dna_string)
-                    lines_on_page += 2
-                    if amino_was_printed:
-                        self.line_printer(amino_string)
-                        lines_on_page += 1
-                    if amino_was_numbered:
-                        self.line_printer(amino_number_string)
-                        lines_on_page += 1
-                    self.line_printer('')
+                    lines_on_page = self.print_block(number_string, dna_string, amino_string,
+                                                     amino_number_string, lines_on_page)
+                    wait_value = 0
+                    amino_wait = 0
                     characters_on_line = 0
-                    lines_on_page += 1
                     amino_string = []
                     number_string = []
                     if self.line_break_print:
@@ -359,124 +393,59 @@ class Reader:
                     self.exon_spacing = False
                     self.amino_spacing = False
 
-                char = sequence[base_position]
-                if pdfannotation_timer > 0:
-                    pdfannotation_timer -=1
-                    dna_string.append(char)
-                    if pdfannotation_timer == 0:
-                        self.line_break_print = True
-                elif char == '}':
-                    dna_string.append(char)
+                # Highlighting for annotations is opened and closed around the bases
+                if closing:
+                    dna_string.append('}')
                     self.line_break_print = False
-                    pass
-                #Deal with the insertions of PDF annotations and highlighting
-                elif char == '\\':
-                    dna_string.append(char)
-                    subseq = sequence[base_position:]
-                    match = re.search(self.pattern, subseq)
-                    try:
-                        pdfannotation_timer = len(match.group())-1
-                    except AttributeError:
-                        print subseq
+                    annotation_end = None
+                if opening:
+                    start, annotation_end, label = annotations[next_annotation]
+                    next_annotation += 1
+                    dna_string.append('\\pdfcomment[date]{%s}\\hl{' % label)
+                    self.line_break_print = True
+                if base_position == len(sequence):
+                    break
 
-                else:
-                    dna_string.append(char)
-
-                    if char.isupper(): self.exon_printed = True
-                    if cds_count == 0:
-                        self.amino_printing = True
-                        cds_count = 1
-                    if amino_acid_counter >= len(protein): self.amino_printing = False
-                    # Calls specific methods for character decision
-                    # Simplifies local logic
-                    (next_amino_string, codon_count, amino_acid_counter,
-                     codon_numbered) = self.decide_amino_string_character(char, codon_count, amino_acid_counter,
-                                                                          codon_numbered, protein)
-                    amino_string.append(next_amino_string)
-                    if next_amino_string == '*': self.check_AA = False
-                    pos3 = ''
-                    pos2 = ''
-                    if next_amino_string != ' ' and self.check_AA:
-                        pos1 = char
-                        check_position = base_position + 1
-                        check_sequence = sequence
-                        #This should only fail on the final exon; where it is not called
-                        try:
-                            check_next_exon = latex_dict['list_of_exons'][position+1]
-                        except IndexError:
-                            pass
-                        if check_sequence[check_position].isupper():
-                            pos2 = check_sequence[check_position]
-                            check_position += 1
-                        else:
-                            check_sequence = latex_dict['exons'][check_next_exon]['sequence']
-                            # print check_sequence
-                            # this = raw_input()
-                            check_position = 0
-                            pos2 = check_sequence[check_position]
-                            while pos2.islower():
-                                check_position += 1
-                                pos2 = check_sequence[check_position]
-                                # print 'pos2 ' + pos2
-                            check_position += 1
-                        if check_sequence[check_position].isupper():
-                            pos3 = check_sequence[check_position]
-                        else:
-                            check_sequence = latex_dict['exons'][check_next_exon]['sequence']
-                            check_position = 0
-                            pos3 = check_sequence[check_position]
-                            while pos3.islower():
-                                check_position += 1
-                                pos3 = check_sequence[check_position]
-                        
-                        if pos1 == '\\' or pos1 == '}':
-                            pass
-                        elif pos2 == '\\' or pos2 == '}':
-                            pass
-                        elif pos3 == '\\' or pos3 == '}':
-                            pass
-                        else:
-                            index = pos1+pos2+pos3
-                            try:
-                                if self.codon_table[index] != next_amino_string:
-                                    print 'There is an error with the amino acid - codon pairing in exon %s: %s - %s, AA# %s' % (str(check_next_exon), index, next_amino_string, str(amino_acid_counter))
-                                    print 'Base 3 position = %s' % str(check_position)
-                                    print 'Next few: %s' % check_sequence[check_position+1:check_position+5]
-                                    this = raw_input()
-                            except KeyError:
-                                print "The key '%s' does not have a codon entry: %s"\
-                                            % (index, self.transcriptdict['genename'])
-                                print dna_string
-
-                    (next_amino_number, amino_wait, codon_numbered,
-                     amino_acid_counter) = self.decide_amino_number_string_character(amino_wait, codon_numbered,
-                                                                                amino_acid_counter)
-                    amino_number_string.append(next_amino_number)
-
-                    (next_number_string, wait_value, cds_count, amino_acid_counter, post_protein_printer, intron_offset,
-                     intron_in_padding, intron_out) = self.decide_number_string_character(char, wait_value, cds_count,
-                                                                                          amino_acid_counter,
-                                                                                          post_protein_printer,
-                                                                                          intron_offset, intron_in_padding,
-                                                                                          len(protein), intron_out)
-                    number_string.append(next_number_string)
-                    characters_on_line += 1
+                char = sequence[base_position]
+                dna_string.append(char)
+
+                if char.isupper(): self.exon_printed = True
+                if cds_count == 0:
+                    self.amino_printing = True
+                    cds_count = 1
+                if amino_acid_counter >= len(protein): self.amino_printing = False
+                # Calls specific methods for character decision
+                # Simplifies local logic
+                (next_amino_string, codon_count, amino_acid_counter,
+                 codon_numbered) = self.decide_amino_string_character(char, codon_count, amino_acid_counter,
+                                                                      codon_numbered, protein)
+                amino_string.append(next_amino_string)
+                if next_amino_string == '*': self.check_AA = False
+                if next_amino_string != ' ' and self.check_AA:
+                    self.check_codon(exon_offset + base_position - first_exonic, next_amino_string,
+                                     exon_number, amino_acid_counter)
+
+                (next_amino_number, amino_wait, codon_numbered,
+                 amino_acid_counter) = self.decide_amino_number_string_character(amino_wait, codon_numbered,
+                                                                            amino_acid_counter)
+                amino_number_string.append(next_amino_number)
+
+                (next_number_string, wait_value, cds_count, amino_acid_counter, post_protein_printer, intron_offset,
+                 intron_in_padding, intron_out) = self.decide_number_string_character(char, wait_value, cds_count,
+                                                                                      amino_acid_counter,
+                                                                                      post_protein_printer,
+                                                                                      intron_offset, intron_in_padding,
+                                                                                      len(protein), intron_out)
+                number_string.append(next_number_string)
+                characters_on_line += 1
 
             # Section for incomplete lines (has not reached line-limit print)
             # Called after exon finishes printing bases
             if len(dna_string) != 0:
-                if lines_on_page >= 44:
-                    if self.write_as_LaTex:
-                        self.print_exon_end()
-                    else:
-                        self.line_printer('  ')
-                        self.line_printer('  ')
+                self.print_final_block(number_string, dna_string, amino_string, amino_number_string,
+                                       lines_on_page)
                 wait_value = 0
                 amino_wait = 0
-                if bool(" ".join(number_string).strip()): self.line_printer(number_string)
-                self.line_printer(dna_string)
-                if bool(" ".join(amino_string).strip()): self.line_printer(amino_string)
-                if bool(" ".join(amino_number_string).strip()): self.line_printer(amino_number_string)
             if self.write_as_LaTex: self.print_exon_end()
             lines_on_page = 2
                 
@@ -487,6 +456,138 @@ class Reader:
         if self.write_as_LaTex:
             self.print_latex_footer()
 			
+    def skip_exon(self, exonic_length, protein, cds_count, codon_count, amino_acid_counter, codon_numbered,
+                  post_protein_printer):
+        """
+        Carries the counters of print_latex through the exonic bases of an exon which
+        is not printed, as if each base had been written
+        :return: cds_count, codon_count, amino_acid_counter, codon_numbered and post_protein_printer
+        """
+        wait_value = 0
+        amino_wait = 0
+        self.exon_printed = True
+        for base_position in xrange(exonic_length):
+            if cds_count == 0:
+                self.amino_printing = True
+                cds_count = 1
+            if amino_acid_counter >= len(protein): self.amino_printing = False
+            (next_amino_string, codon_count, amino_acid_counter,
+             codon_numbered) = self.decide_amino_string_character('N', codon_count, amino_acid_counter,
+                                                                  codon_numbered, protein)
+            if next_amino_string == '*': self.check_AA = False
+            (next_amino_number, amino_wait, codon_numbered,
+             amino_acid_counter) = self.decide_amino_number_string_character(amino_wait, codon_numbered,
+                                                                             amino_acid_counter)
+            (next_number_string, wait_value, cds_count, amino_acid_counter, post_protein_printer, intron_offset,
+             intron_in_padding, intron_out) = self.decide_number_string_character('N', wait_value, cds_count,
+                                                                                  amino_acid_counter,
+                                                                                  post_protein_printer, 0, 0,
+                                                                                  len(protein), 0)
+        return cds_count, codon_count, amino_acid_counter, codon_numbered, post_protein_printer
+
+    def print_exon_details(self, latex_dict, position):
+        """
+        :param latex_dict: the dictionary for the current transcript
+        :param position: index of the exon in the list of exons
+
+        Prints the exon heading and, if requested, a note on any flanking
+        sequence shared with the neighbouring exons
+        """
+        exon_number = latex_dict['list_of_exons'][position]
+        exon_dict = latex_dict['exons'][exon_number]
+        ex_start = exon_dict['genomic_start']
+        ex_end = exon_dict['genomic_end']
+        if self.file_type == 'gbk': ex_start += 1
+        self.line_printer('Exon %s | Start: %s | End: %s | Length: %s' %
+                          (exon_number, str(ex_start), str(ex_end), str(ex_end - ex_start)))
+
+        if self.print_clashes:
+            """ This section allows for a note to be written where the 'intronic' flanking sequence
+                of an exon contains part of the next exon. This serves to clarify whether any overlap
+                may take place. This will not impact the printed output
+
+                A companion segment in the parser classes is responsible for altering the flanking region
+                if the regions are to avoid overlaps.
+            """
+            clash_after = False
+            clash_before = False
+            if exon_number < len(latex_dict['list_of_exons'])-1:
+                try:
+                    # next_exon = exon_number+1
+                    if ex_end > latex_dict['exons'][latex_dict['list_of_exons'][position+1]]['genomic_start']-(self.transcriptdict['pad']*2):
+                        clash_after = True
+                except KeyError:
+                    print 'potential undetected clash after exon ' + str(exon_number)
+            if exon_number > 1:
+                # prev_exon = exon_number-1
+                # print exon_number
+                # print latex_dict['list_of_exons'][exon_index-2]
+                if exon_number > latex_dict['list_of_exons'][position-1]:
+                    if ex_start < latex_dict['exons'][latex_dict['list_of_exons'][position-1]]['genomic_end']+(self.transcriptdict['pad']*2):
+                        clash_before = True
+            if clash_after is True or clash_before is True:
+                self.clash_warnings += 1
+            if clash_after is True and clash_before is True:
+                self.line_printer('BE AWARE: Flanking intron is shared with both adjacent exons')
+            elif clash_after is True:
+                self.line_printer('BE AWARE: Flanking intron is shared with the following exon')
+            elif clash_before is True:
+                self.line_printer('BE AWARE: Flanking intron is shared with the previous exon')
+        self.line_printer('')
+
+    def print_block(self, number_string, dna_string, amino_string, amino_number_string, lines_on_page):
+        """
+        :param lines_on_page: number of lines already on the current page
+        :return: the number of lines on the page after this block
+
+        Prints a complete 60 base block (numbering, bases, amino acids and amino
+        acid numbering), starting a new page first if the block would not fit
+        """
+        amino_was_printed = bool(" ".join(amino_string).strip())
+        amino_was_numbered = bool(" ".join(amino_number_string).strip())
+
+        # print lines_on_page
+        if lines_on_page >= 41:
+            extra_lines = 2   # Base and numbering strings as default
+            if amino_was_numbered: extra_lines += 1
+            if amino_was_printed: extra_lines += 1
+            # print 'total lines: ' + str((lines_on_page) + extra_lines)
+            if ((lines_on_page) + extra_lines) >= 45:
+                if self.write_as_LaTex:
+                    self.print_exon_end()
+                else:
+                    self.line_printer(' ')
+                    self.line_printer(' ')
+                lines_on_page = 0
+        self.line_printer(number_string)
+        self.line_printer(dna_string)
+        lines_on_page += 2
+        if amino_was_printed:
+            self.line_printer(amino_string)
+            lines_on_page += 1
+        if amino_was_numbered:
+            self.line_printer(amino_number_string)
+            lines_on_page += 1
+        self.line_printer('')
+        lines_on_page += 1
+        return lines_on_page
+
+    def print_final_block(self, number_string, dna_string, amino_string, amino_number_string, lines_on_page):
+        """
+        Prints the incomplete block at the end of an exon, leaving out any
+        lines which are blank
+        """
+        if lines_on_page >= 44:
+            if self.write_as_LaTex:
+                self.print_exon_end()
+            else:
+                self.line_printer('  ')
+                self.line_printer('  ')
+        if bool(" ".join(number_string).strip()): self.line_printer(number_string)
+        self.line_printer(dna_string)
+        if bool(" ".join(amino_string).strip()): self.line_printer(amino_string)
+        if bool(" ".join(amino_number_string).strip()): self.line_printer(amino_number_string)
+
     def print_exon_end(self):
 
         self.line_printer('\\end{alltt}')
@@ -506,9 +607,14 @@ class Reader:
         :param string: next string to be written to output list
         :return: none
 
-        Generic print method to handle all list output in one location
+        Generic print method to handle all list output in one location. If a sink
+        has been set (see stream) each line is passed straight on instead of being
+        kept in the output list
         """
-        self.output_list.append(''.join(string))
+        if self.sink is None:
+            self.output_list.append(''.join(string))
+        else:
+            self.sink(''.join(string))
 
     @staticmethod
     def decide_amino_number_string_character(amino_wait, codon_numbered, amino_acid_counter):
@@ -527,6 +633,11 @@ class Reader:
                 output = ' '
         return output, amino_wait, codon_numbered, amino_acid_counter
 
+    @classmethod
+    def clear_memo(cls):
+        """ Releases anything kept for reuse between the transcripts of a gene (nothing here) """
+        pass
+
     def run(self, dictionary, transcript, write_as_latex, list_of_versions, print_clashes, file_type, filename, username):
         print 'Transcript: ' + str(transcript)
         print 'Exon numbers: ' + str(dictionary['transcripts'][transcript]['list_of_exons'])
@@ -539,4 +650,21 @@ class Reader:
         self.print_clashes = print_clashes
         self.file_type = file_type        
         self.print_latex()
+        for line in self.codon_report():
+            print line
         return self.output_list, self.nm
+
+    def stream(self, dictionary, transcript, write_as_latex, list_of_versions, print_clashes, file_type, filename,
+               username, sink):
+        """
+        As run, but every line is handed to sink (e.g. LatexWriter.write_line) as soon
+        as it is created, so the full output is never held in memory
+        :return: the NM number of the transcript
+        """
+        self.sink = sink
+        try:
+            self.run(dictionary, transcript, write_as_latex, list_of_versions, print_clashes, file_type,
+                     filename, username)
+        finally:
+            self.sink = None
+        return self.nm
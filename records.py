@@ -0,0 +1,203 @@
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Compact records for the parser output
+
+    The parsers used to build the transcript dictionary entirely from
+    nested dicts. Gene, Transcript and Exon keep the same information in
+    __slots__ attributes instead, which takes a fraction of the memory of a
+    dict per exon and allows plain attribute access:
+
+        gene.transcripts[1].exons[3].genomic_start
+
+    Each record also behaves as the dict it replaces, so existing code
+    written against the dict shape keeps working unchanged:
+
+        gene['transcripts'][1]['exons'][3]['genomic_start']
+
+    Missing fields raise KeyError when used as a dict, as a dict would, and
+    method names such as 'keys' or 'items' are not keys. Gene accepts any
+    other key (the parser handles such as 'root' or 'full genomic
+    sequence'), holding those in a plain dict
+'''
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+class Record(object):
+    """
+    Dict compatibility for the slotted records. Subclasses list their fields in
+    __slots__, and only those are keys; fields which have not been set are
+    absent, as keys would be, and methods such as 'keys' are never keys
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key, default)
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def keys(self):
+        return [field for field in self.__slots__ if hasattr(self, field)]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        try:
+            return sorted(self.items()) == sorted(other.items())
+        except AttributeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return dict(self.items())
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            self[key] = value
+
+    def __copy__(self):
+        duplicate = self.__class__.__new__(self.__class__)
+        duplicate.__setstate__(self.__getstate__())
+        return duplicate
+
+    def as_dict(self):
+        """ The nested dict shape this record replaces """
+        result = {}
+        for key, value in self.items():
+            if isinstance(value, Record):
+                value = value.as_dict()
+            elif isinstance(value, dict):
+                value = dict((inner_key, inner.as_dict() if isinstance(inner, Record) else inner)
+                             for inner_key, inner in value.items())
+            result[key] = value
+        return result
+
+
+class Exon(Record):
+    """ One exon; sequence includes the flanking intronic sequence, in lower case """
+
+    __slots__ = ('genomic_start', 'genomic_end', 'sequence', 'annotations')
+
+    def __init__(self, genomic_start=None, genomic_end=None, sequence=None):
+        if genomic_start is not None:
+            self.genomic_start = genomic_start
+        if genomic_end is not None:
+            self.genomic_end = genomic_end
+        if sequence is not None:
+            self.sequence = sequence
+
+
+class Transcript(Record):
+    """ One transcript; exons maps exon number to Exon, list_of_exons gives their order """
+
+    __slots__ = ('exons', 'list_of_exons', 'cds_offset', 'protein_seq', 'NM_number', 'NP_number')
+
+    def __init__(self):
+        self.exons = {}
+        self.list_of_exons = []
+
+
+class Gene(Record):
+    """
+    The whole parser output; transcripts maps transcript number to Transcript.
+    Keys other than the named fields are kept in 'extras'
+    """
+
+    __slots__ = ('pad', 'pad_offset', 'genename', 'refseqname', 'transcripts', 'extras')
+
+    def __init__(self, pad=0, **extras):
+        self.pad = pad
+        self.pad_offset = pad % 5
+        self.transcripts = {}
+        self.extras = extras
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            return Record.__getitem__(self, key)
+        return self.extras[key]
+
+    def __setitem__(self, key, value):
+        if key in self.__slots__:
+            Record.__setitem__(self, key, value)
+        else:
+            self.extras[key] = value
+
+    def __delitem__(self, key):
+        if key in self.__slots__:
+            Record.__delitem__(self, key)
+        else:
+            del self.extras[key]
+
+    def __contains__(self, key):
+        if key in self.__slots__:
+            return Record.__contains__(self, key)
+        return key in self.extras
+
+    def get(self, key, default=None):
+        if key in self.__slots__:
+            return Record.get(self, key, default)
+        return self.extras.get(key, default)
+
+    def keys(self):
+        return [field for field in self.__slots__ if field != 'extras' and hasattr(self, field)] + \
+            self.extras.keys()
+
+    def __setstate__(self, state):
+        self.extras = {}
+        Record.__setstate__(self, state)
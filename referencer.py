@@ -0,0 +1,591 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from StringIO import StringIO
+from multiprocessing import Pool, cpu_count
+
+from LrgParser import LrgParser
+from reader import Reader
+from block_reader import BlockReader
+from text_reader import TextReader
+from latex_writer import LatexWriter
+from pdf_writer import PdfWriter
+from primer_module import primer
+from primer_store import PrimerStore
+from disk_cache import ParseCache, PdfCache, RenderState, default_max_bytes, replace_file
+from typesetter import typeset_all, default_timeout
+from instrumentation import RunRecord
+from gene_catalog import GeneCatalog
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' This module is the headless counterpart to XML_gui.py. It exposes the
+    parse -> primer -> Reader -> LatexWriter -> pdflatex chain as plain
+    functions so that it can be driven from the command line or from the
+    GUI, without depending on any Tk state or on the working directory
+
+    Batch usage:
+
+        python -m referencer batch input/ --jobs 4
+
+    Every input file in the directory is handled as a single task in a
+    multiprocessing pool (one gene per task). Each task reports success
+    or failure individually, so a single broken file does not stop the run
+
+    Nothing here loads Tk, and BioPython (by far the slowest import) is only
+    loaded when a GenBank file is parsed, so starting a job for an LRG costs
+    little more than starting Python. XML_gui.py --headless gives the same
+    for the GUI's own options
+'''
+
+default_padding = 300
+# 'native' writes the PDF directly with PdfWriter, 'pdflatex' typesets the .tex
+pdf_backends = ('pdflatex', 'native')
+# Both engines give identical output, 'base' is the original per-base Reader
+reader_engines = {'block': BlockReader, 'base': Reader}
+
+
+def reader_class(engine, write_as_latex):
+    """ The Reader class for the engine; plain text output always uses the TextReader """
+    return reader_engines[engine] if write_as_latex else TextReader
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+def check_file_type(file_name):
+    """ This function takes the file name which has been selected
+        as input. This will identify .xml and .gb/gbk files, and
+        will raise a ValueError for any other file type
+    """
+    if file_name[-4:] == '.xml':
+        return 'lrg'
+    elif file_name[-3:] == '.gb':
+        return 'gbk'
+    elif file_name[-4:] == '.gbk':
+        return 'gbk'
+    else:
+        raise ValueError('This program only works for GenBank and LRG files: %s' % file_name)
+
+
+def parse_exon_range(text):
+    """
+    :param text: an exon number or range of exon numbers, e.g. '7' or '5-9'
+    :return: (first, last) exon numbers, inclusive
+    :raises ValueError: if the text is not a number or range
+    """
+    first, separator, last = text.strip().partition('-')
+    exon_range = (int(first), int(last if separator else first))
+    if exon_range[0] > exon_range[1]:
+        raise ValueError('The exon range %s is backwards' % text)
+    return exon_range
+
+
+def parse_transcripts(text):
+    """
+    :param text: comma separated transcript numbers, e.g. '1,3' (a 't' before each is allowed)
+    :return: set of transcript numbers
+    :raises ValueError: if any part is not a number
+    """
+    return set(int(part.strip().lstrip('tT')) for part in text.split(',') if part.strip())
+
+
+def selection_suffix(exon_range):
+    """ The file name suffix marking output which holds only part of a transcript """
+    if exon_range is None:
+        return ''
+    if exon_range[0] == exon_range[1]:
+        return '-exon%d' % exon_range[0]
+    return '-exons%d-%d' % exon_range
+
+
+def parse_file(file_name, file_type, padding, trim_flanking, streaming=False, parse_cache=None, mapped=False,
+               transcripts=None, exon_range=None):
+    """
+    Reads the input file into the transcript dictionary using the appropriate parser
+    :param streaming: read LRG files in a single iterparse pass rather than a full tree
+    :param mapped: slice LRG exon sequences from a memory map of the file instead of
+                   reading the whole genomic sequence in; the output is the same
+    :param parse_cache: optional ParseCache; a hit skips parsing entirely
+    :param transcripts: transcript numbers to keep, None for all
+    :param exon_range: (first, last) exon numbers whose sequence is read, None for all;
+                       other exons keep only their coordinates and are not printed
+    :return: the dictionary and the version string of the parser which was used
+    """
+    if parse_cache is not None:
+        key = parse_cache.make_key(file_name, file_type, padding, trim_flanking, transcripts, exon_range)
+        cached = parse_cache.load(key)
+        if cached is not None:
+            print 'Using cached parse'
+            return cached
+    if file_type == 'gbk':
+        # Imported here so that BioPython is only loaded once a GenBank file is met
+        from GbkParser import GbkParser
+        gbk_reader = GbkParser(file_name, padding, trim_flanking, None, transcripts, exon_range)
+        dictionary = gbk_reader.run()
+        parser_details = gbk_reader.get_version
+    else:
+        lrg_reader = LrgParser(file_name, padding, trim_flanking, streaming, mapped, transcripts, exon_range)
+        dictionary = lrg_reader.run()
+        parser_details = lrg_reader.get_version
+    parser_details = '{0} {1} {2}'.format(file_type.upper(), 'Parser:', parser_details)
+    if parse_cache is not None:
+        dictionary = parse_cache.strip_handles(dictionary)
+        parse_cache.store(key, (dictionary, parser_details))
+    return dictionary, parser_details
+
+
+def parse_records(file_name, file_type, padding, trim_flanking, streaming=False, parse_cache=None,
+                  multi_record=False, mapped=False, transcripts=None, exon_range=None):
+    """
+    Generator of (dictionary, parser details) for each gene in the input file. This is
+    a single gene except for GenBank files with multi_record set, where each record in
+    the file is parsed only when the previous one has been used, keeping one record in
+    memory at a time. Multi-record files are not held in the parse cache
+    """
+    if file_type == 'gbk' and multi_record:
+        from GbkParser import GbkParser
+        for gbk_reader, dictionary in GbkParser.iterate_records(file_name, padding, trim_flanking, transcripts,
+                                                                 exon_range):
+            yield dictionary, '{0} {1} {2}'.format(file_type.upper(), 'Parser:', gbk_reader.get_version)
+            gbk_reader = dictionary = None
+    else:
+        yield parse_file(file_name, file_type, padding, trim_flanking, streaming, parse_cache, mapped, transcripts,
+                         exon_range)
+
+
+def apply_primers(dictionary, basepath, primer_store=None):
+    """
+    Annotates the dictionary with primers if a CSV is present for the gene
+    :param primer_store: optional PrimerStore holding every CSV, read once for a batch;
+                         otherwise the 'primers' folder in basepath is checked
+    :return: the primer version string, or None if no primers were applied
+    """
+    if primer_store is not None:
+        if dictionary['genename'] not in primer_store:
+            return None
+        primer_label = primer()
+        primer_label.run(dictionary, basepath, primer_store)
+        return 'Primer Labels: ' + primer_label.get_version
+    primer_list = os.listdir(os.path.join(basepath, 'primers'))
+    if dictionary['genename'] + '.csv' in primer_list:
+        primer_label = primer()
+        primer_label.run(dictionary, basepath)
+        return 'Primer Labels: ' + primer_label.get_version
+    return None
+
+
+def clean_up(path, pdf_file):
+    """
+    Removes earlier PDFs for the same gene and transcript. The auxiliary files
+    left by pdflatex stay in the job's scratch directory (see typesetter.py)
+    """
+    pdf_split = pdf_file.split('_')
+    pdf_files = [doc for doc in os.listdir(path) if
+                 doc.split('.')[-1] == 'pdf']
+    for target in pdf_files:
+        target_split = target.split('_')
+        if target_split[0:3] == pdf_split[0:3] \
+                and target_split[-2:] != pdf_split[-2:]:
+            os.remove(os.path.join(path, target))
+
+
+def render_file(file_name, output_dir, username='Anonymous User', padding=default_padding,
+                trim_flanking=True, print_clashes=True, write_as_latex=True, run_latex=True,
+                basepath=None, control_version=None, streaming=False,
+                cache_dir=None, engine='block', latex_jobs=1, latex_timeout=default_timeout,
+                pdf_cache_dir=None, pdf_cache_bytes=default_max_bytes, metrics_file=None,
+                primer_store=None, multi_record=False, mapped=False, incremental=False, pdf_backend='pdflatex',
+                transcripts=None, exon_range=None):
+    """
+    Runs the full pipeline for a single input file, writing one output file for
+    each transcript into output_dir
+
+    :param file_name: LRG (.xml) or GenBank (.gb/.gbk) input file
+    :param output_dir: directory to write into, must contain a 'tex files' folder
+    :param basepath: directory holding the 'primers' folder, defaults to cwd
+    :param control_version: version string of the calling front end, defaults to this module
+    :param streaming: use the iterparse LRG parser mode
+    :param cache_dir: directory of the parse cache, no caching if None
+    :param engine: key of reader_engines, selecting the Reader class used for LaTeX output
+    :param latex_jobs: number of pdflatex processes to run at once for the transcripts
+    :param latex_timeout: seconds allowed for each pdflatex run
+    :param pdf_cache_dir: directory of the PDF cache, pdflatex always runs if None
+    :param pdf_cache_bytes: size limit of the PDF cache
+    :param metrics_file: file to append the run's timing and counters to, as a line of JSON
+    :param primer_store: PrimerStore to take primers from instead of reading the CSV
+    :param multi_record: render every record of a GenBank file, not only the first
+    :param mapped: read LRG exon sequences through a memory map of the input file
+    :param incremental: with cache_dir, keep the earlier output of any transcript whose
+                        primer annotations are unchanged since it was last rendered
+    :param pdf_backend: one of pdf_backends; 'native' writes each PDF directly, with no
+                        .tex file and no pdflatex run
+    :param transcripts: transcript numbers to render, None for all
+    :param exon_range: (first, last) exon numbers to render, None for all. The output
+                       file names are marked with the range (see selection_suffix)
+    :return: list of the output files which were written
+    """
+    record = RunRecord(file_name)
+    try:
+        written = run_pipeline(record, file_name, output_dir, username, padding, trim_flanking, print_clashes,
+                               write_as_latex, run_latex, basepath, control_version, streaming, cache_dir,
+                               engine, latex_jobs, latex_timeout, pdf_cache_dir, pdf_cache_bytes, primer_store,
+                               multi_record, mapped, incremental, pdf_backend, transcripts, exon_range)
+        record.finish(True)
+        return written
+    except (Exception, SystemExit) as error:
+        record.finish(False, repr(error))
+        raise
+    finally:
+        if metrics_file:
+            record.write(metrics_file)
+
+
+def run_pipeline(record, file_name, output_dir, username, padding, trim_flanking, print_clashes, write_as_latex,
+                 run_latex, basepath, control_version, streaming, cache_dir, engine, latex_jobs, latex_timeout,
+                 pdf_cache_dir, pdf_cache_bytes, primer_store, multi_record, mapped, incremental,
+                 pdf_backend, transcripts=None, exon_range=None):
+    """ The body of render_file, timing each stage and counting into the RunRecord """
+    if basepath is None:
+        basepath = os.getcwd()
+    if control_version is None:
+        control_version = get_version()
+    file_type = check_file_type(file_name)
+    parse_cache = ParseCache(cache_dir) if cache_dir else None
+    print 'Running parser'
+    file_stem = os.path.splitext(os.path.basename(file_name))[0]
+    records = parse_records(file_name, file_type, padding, trim_flanking, streaming, parse_cache, multi_record,
+                            mapped, transcripts, exon_range)
+    native_pdf = write_as_latex and run_latex and pdf_backend == 'native'
+    writer_class = PdfWriter if native_pdf else LatexWriter
+    render_state = RenderState(cache_dir) if cache_dir and incremental else None
+    if render_state is not None:
+        input_hash = render_state.hash_file(file_name)
+    states = []
+    written = []
+    latex_files = []
+    genes = []
+    while True:
+        with record.stage('parse'):
+            parsed = next(records, None)
+        if parsed is None:
+            break
+        dictionary, parser_details = parsed
+        genes.append(dictionary['genename'])
+        record.note('gene', ', '.join(genes))
+        with record.stage('primers'):
+            primer_details = apply_primers(dictionary, basepath, primer_store)
+        record.count('primer_hits', count_primer_hits(dictionary))
+        if render_state is not None:
+            state_key = render_state.make_key(input_hash, dictionary['genename'], [
+                padding, trim_flanking, print_clashes, write_as_latex, run_latex, engine, username,
+                control_version, parser_details, primer_details, output_dir, native_pdf, exon_range])
+            previous = render_state.load(state_key) or {}
+            current = {}
+            states.append((state_key, current))
+        for transcript in dictionary['transcripts']:
+            if render_state is not None:
+                signature = render_state.annotation_signature(dictionary['transcripts'][transcript])
+                outputs = render_state.reusable(previous, transcript, signature)
+                if outputs is not None:
+                    print 'transcript: %d is unchanged, keeping %s' % (transcript, ', '.join(outputs))
+                    record.count('transcripts_reused')
+                    current[transcript] = (signature, outputs)
+                    written.extend(outputs)
+                    continue
+            output_file = render_transcript(record, dictionary, transcript, parser_details, primer_details,
+                                            control_version, engine, file_type, file_stem, output_dir,
+                                            username, print_clashes, write_as_latex, writer_class, exon_range)
+            if native_pdf:
+                clean_up(output_dir, os.path.basename(output_file))
+                outputs = [output_file]
+                written.extend(outputs)
+            elif write_as_latex and run_latex:
+                latex_files.append(output_file + (output_dir,))
+                outputs = [output_file[1]]
+            else:
+                outputs = [output_file[0] if write_as_latex else output_file]
+                written.extend(outputs)
+            if render_state is not None:
+                current[transcript] = (signature, outputs)
+        # Release this gene before the next record is parsed
+        reader_class(engine, write_as_latex).clear_memo()
+        parsed = dictionary = None
+    if latex_files:
+        pdf_cache = PdfCache(pdf_cache_dir, pdf_cache_bytes) if pdf_cache_dir else None
+        with record.stage('typeset'):
+            written.extend(typeset_transcripts(latex_files, latex_jobs, latex_timeout, pdf_cache))
+    # Only recorded once every output is in place
+    for state_key, current in states:
+        render_state.store(state_key, current)
+    return written
+
+
+def render_transcript(record, dictionary, transcript, parser_details, primer_details, control_version, engine,
+                      file_type, file_stem, output_dir, username, print_clashes, write_as_latex,
+                      writer_class=LatexWriter, exon_range=None):
+    """
+    Renders one transcript to its output file
+    :param writer_class: LatexWriter, or PdfWriter to write the PDF directly
+    :param exon_range: the exon range the dictionary was parsed with, marked in the file name
+    :return: as LatexWriter.run, the .tex and .pdf names for LaTeX or the .txt name;
+             the PDF name for a PdfWriter
+    """
+    print 'transcript: %d' % transcript
+    input_reader = reader_class(engine, write_as_latex)()
+    writer = writer_class()
+    reader_details = 'Reader: ' + input_reader.get_version
+    writer_details = 'Writer: ' + writer.get_version
+    control_details = 'Control: ' + control_version
+    list_of_versions = [parser_details, reader_details, writer_details, control_details]
+    if primer_details:
+        list_of_versions.append(primer_details)
+    lrg_num = file_stem.replace('_', '\_') + 't' + str(transcript)
+    # Lines go straight from the Reader into the output file, which is only
+    # named once complete as the GenBank name depends on the transcript NM.
+    # The 'render' stage therefore includes the buffered writes
+    writer.open_stream(output_dir)
+    try:
+        with record.stage('render'):
+            nm = input_reader.stream(dictionary, transcript, write_as_latex, list_of_versions,
+                                     print_clashes, file_type, lrg_num, username, writer.write_line)
+    except:
+        writer.abort_stream()
+        raise
+    exons = dictionary['transcripts'][transcript]['exons']
+    record.count('transcripts')
+    record.count('exons', sum(1 for exon in exons.values() if 'sequence' in exon))
+    record.count('bases', sum(len(exon.get('sequence', '')) for exon in exons.values()))
+    record.count('codon_mismatches', len(input_reader.codon_mismatches))
+    record.count('clash_warnings', input_reader.clash_warnings)
+    if file_type == 'gbk':
+        filename = dictionary['genename'] + '_' + nm
+    else:
+        filename = dictionary['genename'] + '_' + file_stem + 't' + str(transcript)
+    filename = os.path.join(output_dir, filename + selection_suffix(exon_range))
+    with record.stage('write'):
+        output_file = writer.close_stream(filename, write_as_latex)
+    print str(transcript) + ' has been printed'
+    return output_file
+
+
+def count_primer_hits(dictionary):
+    """ Number of primer annotations, counting exon records shared by transcripts once """
+    records = {}
+    for transcript in dictionary['transcripts'].values():
+        for exon in transcript['exons'].values():
+            records[id(exon)] = len(exon.get('annotations', []))
+    return sum(records.values())
+
+
+def typeset_transcripts(latex_files, latex_jobs, latex_timeout, pdf_cache=None):
+    """
+    Typesets every written .tex file, then removes superseded PDFs. Files whose
+    TeX is found in the PDF cache are copied from it rather than typeset
+    :return: list of the PDFs which were produced
+    :raises RuntimeError: if any pdflatex job failed, after printing the end of its log
+    """
+    pdfs = []
+    keys = {}
+    to_typeset = []
+    for latex_file, pdf_file, output_dir in latex_files:
+        if pdf_cache is not None:
+            keys[pdf_file] = pdf_cache.make_key(latex_file)
+            if pdf_cache.fetch_file(keys[pdf_file], pdf_file):
+                print 'Using cached PDF for ' + os.path.basename(latex_file)
+                latex_name = os.path.basename(latex_file)
+                replace_file(latex_file, os.path.join(output_dir, 'tex files', latex_name))
+                clean_up(output_dir, os.path.basename(pdf_file))
+                pdfs.append(pdf_file)
+                continue
+        to_typeset.append((latex_file, pdf_file, output_dir))
+    if to_typeset:
+        print 'Running pdflatex for %d files' % len(to_typeset)
+    failed = []
+    for job in typeset_all(to_typeset, latex_jobs, latex_timeout):
+        if job.success:
+            if pdf_cache is not None:
+                pdf_cache.store_file(keys[job.pdf_file], job.pdf_file)
+            clean_up(job.output_dir, job.pdf_name)
+            pdfs.append(job.pdf_file)
+        else:
+            failed.append(job.pdf_name)
+            print 'pdflatex failed for %s: %s' % (job.latex_name, job.error)
+            for line in job.log.splitlines()[-20:]:
+                print '    ' + line
+    if failed:
+        raise RuntimeError('Typesetting failed: ' + ', '.join(failed))
+    return pdfs
+
+
+def _batch_task(task):
+    """
+    Pool worker for a single input file. All console output from the pipeline is
+    captured, and every failure (including SystemExit from the parsers) is
+    returned as part of the result rather than raised
+    """
+    file_name, options = task
+    start = time.time()
+    captured = StringIO()
+    saved_stdout = sys.stdout
+    sys.stdout = captured
+    try:
+        written = render_file(file_name, **options)
+        result = (file_name, True, written, '')
+    except (Exception, SystemExit):
+        result = (file_name, False, [], traceback.format_exc())
+    finally:
+        sys.stdout = saved_stdout
+    return result + (time.time() - start, captured.getvalue())
+
+
+def find_inputs(path):
+    """ Lists the LRG and GenBank files in a directory, or returns a single file """
+    if os.path.isfile(path):
+        return [path]
+    inputs = []
+    for name in sorted(os.listdir(path)):
+        try:
+            check_file_type(name)
+        except ValueError:
+            continue
+        inputs.append(os.path.join(path, name))
+    return inputs
+
+
+def find_gene(genename, input_dir='input', catalog_file=None):
+    """
+    Looks a gene symbol up in the gene catalogue of the input directory
+    :return: list of the LRG files for the gene, empty if there are none
+    """
+    if not os.path.isdir(input_dir):
+        return []
+    return GeneCatalog.open(input_dir, catalog_file).find(genename)
+
+
+def run_batch(inputs, options, jobs=1, verbose=False):
+    """
+    Renders every input file, fanning out across a process pool when jobs > 1
+    :return: list of (file_name, success, written, error, seconds, log) tuples
+    """
+    tasks = [(file_name, options) for file_name in inputs]
+    if jobs > 1:
+        pool = Pool(processes=jobs)
+        results_iter = pool.imap_unordered(_batch_task, tasks)
+    else:
+        pool = None
+        results_iter = (_batch_task(task) for task in tasks)
+    results = []
+    try:
+        for result in results_iter:
+            file_name, success, written, error, seconds, log = result
+            if success:
+                print 'OK    %s (%d files, %.2fs)' % (file_name, len(written), seconds)
+            else:
+                print 'FAIL  %s (%.2fs): %s' % (file_name, seconds, error.strip().splitlines()[-1])
+                if verbose:
+                    print log
+                    print error
+            results.append(result)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    failures = [result[0] for result in results if not result[1]]
+    print '%d of %d files rendered successfully' % (len(results) - len(failures), len(results))
+    if failures:
+        print 'Failed: ' + ', '.join(failures)
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Headless reference sequence writer')
+    subparsers = arg_parser.add_subparsers(dest='command')
+    batch = subparsers.add_parser('batch', help='render every LRG/GenBank file in a directory')
+    batch.add_argument('input', help='input directory, a single file, or a gene symbol to find in --input-dir')
+    batch.add_argument('--jobs', type=int, default=1, help='number of worker processes')
+    batch.add_argument('--output', default='output', help='output directory')
+    batch.add_argument('--user', dest='username', default='Anonymous User')
+    batch.add_argument('--padding', type=int, default=default_padding)
+    batch.add_argument('--trim', dest='trim_flanking', action='store_false', default=True)
+    batch.add_argument('--clashes', dest='print_clashes', action='store_false', default=True)
+    batch.add_argument('--text', dest='write_as_latex', action='store_false', default=True)
+    batch.add_argument('--no-pdf', dest='run_latex', action='store_false', default=True,
+                       help='write .tex files without running pdflatex')
+    batch.add_argument('--stream', dest='streaming', action='store_true',
+                       help='parse LRG files in a single streaming pass')
+    batch.add_argument('--mmap', dest='mapped', action='store_true',
+                       help='slice LRG exon sequences from a memory map of the file')
+    batch.add_argument('--cache', dest='cache_dir', default=None,
+                       help='directory for the parse cache, reused between runs')
+    batch.add_argument('--incremental', action='store_true',
+                       help='with --cache, only render transcripts whose primer annotations changed')
+    batch.add_argument('--engine', choices=sorted(reader_engines), default='block',
+                       help='line rendering engine')
+    batch.add_argument('--pdf-backend', choices=pdf_backends, default='pdflatex',
+                       help='native writes each PDF directly, without pdflatex or a TeX install')
+    batch.add_argument('--latex-jobs', type=int, default=None,
+                       help='pdflatex processes per file, defaults to the CPU count when --jobs is 1')
+    batch.add_argument('--latex-timeout', type=int, default=default_timeout,
+                       help='seconds allowed for each pdflatex run')
+    batch.add_argument('--pdf-cache', dest='pdf_cache_dir', default=None,
+                       help='directory of built PDFs, reused when the TeX is unchanged')
+    batch.add_argument('--pdf-cache-size', type=int, default=default_max_bytes / (1024 * 1024),
+                       help='size limit of the PDF cache in MB')
+    batch.add_argument('--metrics', dest='metrics_file', default=None,
+                       help='append a JSON record of stage times and counts for each file')
+    batch.add_argument('--primer-index', default=None,
+                       help='file to keep the primer index in, rebuilt when any primer CSV changes')
+    batch.add_argument('--multi-record', action='store_true',
+                       help='render every record of multi-record GenBank files, one at a time')
+    batch.add_argument('--transcripts', type=parse_transcripts, default=None,
+                       help='only render these transcripts, e.g. 1,3')
+    batch.add_argument('--exons', dest='exon_range', type=parse_exon_range, default=None,
+                       help='only render this exon or range of exons, e.g. 5-9')
+    batch.add_argument('--input-dir', default='input', help='directory searched for a gene symbol given as input')
+    batch.add_argument('--catalog', dest='catalog_file', default=None,
+                       help='gene catalogue file, defaults to gene_catalog.pkl in --input-dir')
+    batch.add_argument('--verbose', action='store_true', help='show the full log for failed files')
+    args = arg_parser.parse_args(argv)
+    if args.incremental and not args.cache_dir:
+        arg_parser.error('--incremental needs --cache')
+    if os.path.exists(args.input):
+        inputs = find_inputs(args.input)
+    else:
+        inputs = find_gene(args.input, args.input_dir, args.catalog_file)
+        if not inputs:
+            arg_parser.error('%s is not a file, a directory or a gene in %s' % (args.input, args.input_dir))
+
+    output_dir = os.path.abspath(args.output)
+    if not os.path.isdir(os.path.join(output_dir, 'tex files')):
+        os.makedirs(os.path.join(output_dir, 'tex files'))
+    latex_jobs = args.latex_jobs
+    if latex_jobs is None:
+        latex_jobs = cpu_count() if args.jobs == 1 else 1
+    # Every primer CSV is read once here and the store handed to each task
+    primer_store = PrimerStore.open(os.path.join(os.getcwd(), 'primers'), args.primer_index)
+    options = dict(output_dir=output_dir, username=args.username, padding=args.padding,
+                   trim_flanking=args.trim_flanking, print_clashes=args.print_clashes,
+                   write_as_latex=args.write_as_latex, run_latex=args.run_latex,
+                   basepath=os.getcwd(), streaming=args.streaming, mapped=args.mapped,
+                   cache_dir=args.cache_dir and os.path.abspath(args.cache_dir),
+                   engine=args.engine, latex_jobs=latex_jobs, latex_timeout=args.latex_timeout,
+                   pdf_cache_dir=args.pdf_cache_dir and os.path.abspath(args.pdf_cache_dir),
+                   pdf_cache_bytes=args.pdf_cache_size * 1024 * 1024,
+                   metrics_file=args.metrics_file and os.path.abspath(args.metrics_file),
+                   primer_store=primer_store, multi_record=args.multi_record, incremental=args.incremental,
+                   pdf_backend=args.pdf_backend, transcripts=args.transcripts, exon_range=args.exon_range)
+    results = run_batch(inputs, options, args.jobs, args.verbose)
+    return 0 if all(result[1] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import traceback
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from multiprocessing.pool import ThreadPool
+
+from referencer import check_file_type, parse_file, apply_primers, find_inputs, render_transcript, \
+    typeset_transcripts, reader_engines, pdf_backends, default_padding
+from latex_writer import LatexWriter
+from pdf_writer import PdfWriter
+from primer_store import PrimerStore
+from disk_cache import ParseCache
+from typesetter import default_timeout
+from instrumentation import RunRecord
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' A long running local service which renders references on request
+
+        python -m render_service input/ --port 8080 --workers 4
+
+    Every input file is parsed once when the service starts and kept in
+    memory, with its primers applied from a PrimerStore, so a request pays
+    only for the Reader, the writer and (for PDFs) typesetting:
+
+        GET /gene/BRCA1?transcript=1&format=pdf
+        GET /gene/BRCA1?format=txt&user=Matt
+        GET /genes
+
+    format is pdf (the default), tex or txt, and transcript defaults to the
+    first. user is written into the TeX, so may only hold letters, digits,
+    spaces and . , ' - characters. /genes lists every gene with its
+    transcripts as JSON. Requests are accepted concurrently and rendered
+    by a fixed pool of workers, each in its own scratch directory, so the
+    output directory is never touched. If a primer CSV is added or changed
+    the store is read again and the genes concerned are parsed again on
+    their next request. The service listens on localhost only
+'''
+
+content_types = {'pdf': 'application/pdf', 'tex': 'application/x-tex', 'txt': 'text/plain'}
+# The user name is written into the TeX as it is, so only characters with no meaning to TeX are accepted
+username_pattern = re.compile(r"^[A-Za-z0-9 .,'-]{1,64}\Z")
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+class RequestError(Exception):
+    """ A request which cannot be served, with the HTTP status to answer it with """
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class RenderService:
+    """
+    The parsed corpus and primer store, and the pool which renders from them
+    """
+
+    def __init__(self, input_path, basepath, padding=default_padding, engine='block', pdf_backend='pdflatex',
+                 workers=4, cache_dir=None, primer_index=None, latex_timeout=default_timeout):
+        self.input_path = input_path
+        self.basepath = basepath
+        self.padding = padding
+        self.engine = engine
+        self.pdf_backend = pdf_backend
+        self.latex_timeout = latex_timeout
+        self.parse_cache = ParseCache(cache_dir) if cache_dir else None
+        self.primer_index = primer_index
+        self.primer_store = None
+        self.genes = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPool(workers)
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    def load(self):
+        """ Parses every input file and applies its primers """
+        self.primer_store = PrimerStore.open(os.path.join(self.basepath, 'primers'), self.primer_index)
+        for file_name in find_inputs(self.input_path):
+            try:
+                entry = self.parse(file_name)
+            except (Exception, SystemExit) as error:
+                print 'Skipping %s: %r' % (file_name, error)
+                continue
+            key = entry['dictionary']['genename'].upper()
+            if key in self.genes:
+                print 'Skipping %s: %s is already loaded from %s' % (file_name, key, self.genes[key]['file_name'])
+                continue
+            self.genes[key] = entry
+        print 'Loaded %d genes' % len(self.genes)
+        return self
+
+    def parse(self, file_name):
+        """ The corpus entry for one input file, parsed and annotated with primers """
+        file_type = check_file_type(file_name)
+        dictionary, parser_details = parse_file(file_name, file_type, self.padding, True,
+                                                parse_cache=self.parse_cache)
+        primer_details = apply_primers(dictionary, self.basepath, self.primer_store)
+        return {'file_name': file_name, 'file_type': file_type, 'dictionary': dictionary,
+                'parser_details': parser_details, 'primer_details': primer_details,
+                'primer_signature': self.primer_store.signature}
+
+    def lookup(self, genename):
+        """
+        :return: the corpus entry for a gene, parsed again if the primer CSVs have changed
+        :raises RequestError: 404 if no input file holds the gene
+        """
+        key = genename.upper()
+        with self.lock:
+            if key not in self.genes:
+                raise RequestError(404, 'No input file holds gene %s' % genename)
+            if self.primer_store.signature != self.primer_store.directory_signature():
+                print 'Primer CSVs have changed, reading them again'
+                self.primer_store = PrimerStore.open(self.primer_store.directory, self.primer_index)
+            entry = self.genes[key]
+            if entry['primer_signature'] != self.primer_store.signature:
+                # Primers are held in the exon records, so start again from an unannotated parse
+                entry = self.genes[key] = self.parse(entry['file_name'])
+            return entry
+
+    def gene_list(self):
+        return dict((entry['dictionary']['genename'], sorted(entry['dictionary']['transcripts']))
+                    for entry in self.genes.values())
+
+    def render(self, genename, transcript, output_format, username):
+        """
+        Renders one transcript in the worker pool
+        :return: (file name, file contents)
+        :raises RequestError: for an unknown gene or transcript, or an unknown format
+        """
+        if output_format not in content_types:
+            raise RequestError(400, 'format must be one of ' + ', '.join(sorted(content_types)))
+        entry = self.lookup(genename)
+        transcripts = entry['dictionary']['transcripts']
+        if transcript is None:
+            transcript = min(transcripts)
+        if transcript not in transcripts:
+            raise RequestError(404, '%s has no transcript %d' % (genename, transcript))
+        return self.pool.apply(self.render_entry, (entry, transcript, output_format, username))
+
+    def render_entry(self, entry, transcript, output_format, username):
+        """ The worker side of render, writing into a scratch directory which is then removed """
+        scratch = tempfile.mkdtemp(prefix='render-service-')
+        os.mkdir(os.path.join(scratch, 'tex files'))
+        try:
+            native_pdf = output_format == 'pdf' and self.pdf_backend == 'native'
+            file_stem = os.path.splitext(os.path.basename(entry['file_name']))[0]
+            output_file = render_transcript(RunRecord(entry['file_name']), entry['dictionary'], transcript,
+                                            entry['parser_details'], entry['primer_details'], get_version(),
+                                            self.engine, entry['file_type'], file_stem, scratch, username,
+                                            True, output_format != 'txt',
+                                            PdfWriter if native_pdf else LatexWriter)
+            if output_format == 'tex':
+                output_file = output_file[0]
+            elif output_format == 'pdf' and not native_pdf:
+                output_file = typeset_transcripts([output_file + (scratch,)], 1, self.latex_timeout)[0]
+            with open(output_file, 'rb') as output:
+                return os.path.basename(output_file), output.read()
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """ Maps GET /gene/<name> and GET /genes on to the RenderService held by the server """
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if parts == ['genes']:
+                self.respond(200, 'application/json', json.dumps(self.server.service.gene_list(), sort_keys=True))
+            elif len(parts) == 2 and parts[0] == 'gene':
+                try:
+                    transcript = int(query['transcript'][0]) if 'transcript' in query else None
+                except ValueError:
+                    raise RequestError(400, 'transcript must be a number')
+                output_format = query.get('format', ['pdf'])[0]
+                username = query.get('user', ['Anonymous User'])[0]
+                if not username_pattern.match(username):
+                    raise RequestError(400, 'user may only hold letters, digits, spaces and . , \' -')
+                file_name, data = self.server.service.render(parts[1], transcript, output_format, username)
+                self.respond(200, content_types[output_format], data, file_name)
+            else:
+                raise RequestError(404, 'Use /gene/<name>?transcript=1&format=pdf or /genes')
+        except RequestError as error:
+            self.respond(error.status, 'text/plain', str(error) + '\n')
+        except (Exception, SystemExit):
+            self.respond(500, 'text/plain', traceback.format_exc())
+
+    def respond(self, status, content_type, body, file_name=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if file_name:
+            self.send_header('Content-Disposition', 'inline; filename="%s"' % file_name)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RenderServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        HTTPServer.__init__(self, address, RenderRequestHandler)
+        self.service = service
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description='Local reference sequence render service')
+    arg_parser.add_argument('input', nargs='?', default='input', help='input directory (or a single file)')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--workers', type=int, default=4, help='number of concurrent renders')
+    arg_parser.add_argument('--padding', type=int, default=default_padding)
+    arg_parser.add_argument('--engine', choices=sorted(reader_engines), default='block')
+    arg_parser.add_argument('--pdf-backend', choices=pdf_backends, default='pdflatex')
+    arg_parser.add_argument('--latex-timeout', type=int, default=default_timeout)
+    arg_parser.add_argument('--cache', dest='cache_dir', default=None, help='parse cache directory')
+    arg_parser.add_argument('--primer-index', default=None, help='primer index file')
+    args = arg_parser.parse_args(argv)
+
+    service = RenderService(args.input, os.getcwd(), args.padding, args.engine, args.pdf_backend, args.workers,
+                            args.cache_dir and os.path.abspath(args.cache_dir), args.primer_index,
+                            args.latex_timeout).load()
+    server = RenderServer(('127.0.0.1', args.port), service)
+    print 'Serving on http://127.0.0.1:%d/' % args.port
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import unittest
+from records import Gene, Transcript, Exon
+from text_reader import TextReader
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '18/10/2026'
+''' Checks the TextReader on an exon it cannot lay out a block at a time
+
+        python -m unittest test_text_reader
+'''
+
+
+def make_gene():
+    """
+    A one exon gene whose 3' flank holds upper case bases, so the exon is not lower case
+    flank, upper case exon, lower case flank, with a primer over the start of the exon
+    """
+    gene = Gene(10)
+    gene['genename'] = 'TEST'
+    gene['refseqname'] = 'NG_000000.1'
+    transcript = Transcript()
+    exon_sequence = 'ATG' + 'GCT' * 30 + 'AAA' * 10 + 'TGA'
+    sequence = 'c' * 10 + exon_sequence + 'gtaagt' + 'AG' + 'ttttt'
+    transcript['exons'][1] = Exon(11, 10 + len(exon_sequence), sequence)
+    transcript['exons'][1]['annotations'] = [(8, 30, 'Primer 1F, Frag size = 300')]
+    transcript['list_of_exons'].append(1)
+    transcript['cds_offset'] = 0
+    transcript['protein_seq'] = 'M' + 'A' * 30 + 'K' * 10 + '* '
+    transcript['NM_number'] = 'NM_000000.1'
+    transcript['NP_number'] = 'NP_000000.1'
+    gene['transcripts'][1] = transcript
+    return gene
+
+
+class TextReaderFallbackTest(unittest.TestCase):
+
+    def render(self):
+        reader = TextReader()
+        lines, nm = reader.run(make_gene(), 1, False, ['Version: test'], False, 'lrg', 'LRG\\_0t1', 'Tester')
+        return reader, lines
+
+    def test_exon_is_not_block_shaped(self):
+        gene = make_gene()
+        reader = TextReader()
+        reader.transcriptdict = gene
+        reader.file_type = 'lrg'
+        reader.build_cds_map(gene['transcripts'][1])
+        self.assertFalse(reader.is_block_shaped(gene['transcripts'][1], 0))
+
+    def test_no_latex_in_output(self):
+        reader, lines = self.render()
+        for line in lines:
+            self.assertNotIn('\\', line)
+
+    def test_header_and_primer_markers(self):
+        reader, lines = self.render()
+        self.assertEqual(lines[0], 'Gene: TEST - Sequence: NG_000000.1')
+        self.assertIn('A: Primer 1F, Frag size = 300', lines)
+        self.assertIn(' ' * 8 + 'A' * 22, lines)
+
+    def test_numbering_and_codons(self):
+        reader, lines = self.render()
+        self.assertTrue(any(line.startswith('cccccccccc' + 'ATG') for line in lines))
+        self.assertTrue(any(line.lstrip().startswith('|1 ') for line in lines))
+        self.assertEqual(reader.codon_mismatches, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import threading
+import time
+from string import ascii_uppercase
+from block_reader import BlockReader
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+
+''' Plain text rendering engine, used for --text output in place of the
+    LaTeX oriented Reader
+
+    The layout is that of the PDF: numbering, bases, amino acids and amino
+    acid numbering in blocks of 60 columns, built a block at a time as in
+    the BlockReader. Nothing is written for LaTeX: there is no preamble,
+    no highlighting or comment markup and no page breaks. A primer is
+    instead shown by a marker line under the bases it covers, each primer
+    in an exon having its own letter, and the letters are listed with the
+    primer labels under the exon heading:
+
+        A: Primer 3F, Frag size = 300
+        ...
+        ctccagGTGAGCGGCATCGCCTTTCTTCTCCT...
+                   AAAAAAAAAAAAAAAAAAAA
+
+    Exons which are not lower case flank, upper case exon, lower case
+    flank cannot be laid out a block at a time. For a transcript with such
+    an exon the blocks are instead worked out a base at a time with the
+    Reader's counters (see per_base_blocks), and printed in the same way.
+'''
+
+
+class TextReader(BlockReader):
+    """
+    Renders the transcript as plain fixed width text
+    """
+
+    # Base lines here carry no highlighting, so are not shared with the BlockReader memo
+    memo_state = threading.local()
+
+    @property
+    def get_version(self):
+        """
+        Quick function to grab version details for final printing
+        :return:
+        """
+        return 'Text Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+    def print_latex(self):
+        """
+        Builds the plain text output, one line block at a time
+        """
+        latex_dict = self.transcriptdict['transcripts'][self.transcript]
+        exon_list = latex_dict['list_of_exons']
+        self.build_cds_map(latex_dict)
+        per_base = None
+        for position in range(len(exon_list)):
+            if self.is_selected(latex_dict, position) and not self.is_block_shaped(latex_dict, position):
+                per_base = self.per_base_blocks(latex_dict)
+                break
+
+        self.print_text_header(latex_dict)
+        if per_base is None:
+            self.reset_memo()
+            self.set_cds_coordinates(latex_dict)
+            self.check_all_codons(latex_dict)
+        for position in range(len(exon_list)):
+            if not self.is_selected(latex_dict, position):
+                continue
+            exon_dict = latex_dict['exons'][exon_list[position]]
+            annotations = exon_dict.get('annotations', [])
+            self.print_exon_details(latex_dict, position)
+            for index, (start, end, label) in enumerate(annotations):
+                self.line_printer('%s: %s' % (self.marker(index), label))
+            if annotations:
+                self.line_printer('')
+            markers = self.annotation_markers(len(exon_dict['sequence']), annotations)
+            line_start = 0
+            blocks = per_base[position] if per_base is not None else self.exon_blocks(latex_dict, position)
+            for number_string, dna_string, amino_string, amino_number_string in blocks:
+                marker_string = markers[line_start:line_start + len(dna_string)].rstrip()
+                line_start += len(dna_string)
+                for line in (number_string, dna_string, marker_string, amino_string, amino_number_string):
+                    if line.strip():
+                        self.line_printer(line.rstrip())
+                self.line_printer('')
+
+        for version in self.list_of_versions:
+            assert isinstance(version, str)
+            self.line_printer(version)
+
+    def per_base_blocks(self, latex_dict):
+        """
+        The line blocks of every selected exon, each character decided a base at a time
+        as in Reader.print_latex, with no highlighting or page breaks. Codons are checked
+        as they are met
+        :return: dictionary of exon position -> list of (number, bases, amino acid, amino
+                 acid number) line tuples, as exon_blocks returns for one exon
+        """
+        protein = latex_dict['protein_seq']
+        exon_list = latex_dict['list_of_exons']
+        # There is no base 0, so the count starts one further back (see Reader.print_latex)
+        cds_count = -latex_dict['cds_offset']
+        codon_count = 3
+        amino_acid_counter = 0
+        codon_numbered = False
+        post_protein_printer = 0
+        blocks = {}
+        for position in range(len(exon_list)):
+            if not self.is_selected(latex_dict, position):
+                (cds_count, codon_count, amino_acid_counter, codon_numbered,
+                 post_protein_printer) = self.skip_exon(self.cds_map[position][2], protein, cds_count, codon_count,
+                                                        amino_acid_counter, codon_numbered, post_protein_printer)
+                continue
+            exon_number = exon_list[position]
+            sequence = latex_dict['exons'][exon_number]['sequence']
+            first_exonic, exon_offset, exonic_length = self.cds_map[position]
+            intron_offset = self.transcriptdict['pad_offset']
+            intron_in_padding = self.transcriptdict['pad']
+            intron_out = 0
+            wait_value = 0
+            amino_wait = 0
+            self.exon_printed = False
+            self.exon_spacing = False
+            self.amino_spacing = False
+            blocks[position] = []
+            lines = ([], [], [], [])
+            for base_position in range(len(sequence)):
+                if base_position and base_position % self.line_length == 0:
+                    blocks[position].append(tuple(''.join(line) for line in lines))
+                    lines = ([], [], [], [])
+                    wait_value = 0
+                    amino_wait = 0
+                    self.exon_spacing = False
+                    self.amino_spacing = False
+                number_string, dna_string, amino_string, amino_number_string = lines
+
+                char = sequence[base_position]
+                dna_string.append(char)
+                if char.isupper(): self.exon_printed = True
+                if cds_count == 0:
+                    self.amino_printing = True
+                    cds_count = 1
+                if amino_acid_counter >= len(protein): self.amino_printing = False
+                (next_amino_string, codon_count, amino_acid_counter,
+                 codon_numbered) = self.decide_amino_string_character(char, codon_count, amino_acid_counter,
+                                                                      codon_numbered, protein)
+                amino_string.append(next_amino_string)
+                if next_amino_string == '*': self.check_AA = False
+                if next_amino_string != ' ' and self.check_AA:
+                    self.check_codon(exon_offset + base_position - first_exonic, next_amino_string,
+                                     exon_number, amino_acid_counter)
+                (next_amino_number, amino_wait, codon_numbered,
+                 amino_acid_counter) = self.decide_amino_number_string_character(amino_wait, codon_numbered,
+                                                                                 amino_acid_counter)
+                amino_number_string.append(next_amino_number)
+                (next_number_string, wait_value, cds_count, amino_acid_counter, post_protein_printer, intron_offset,
+                 intron_in_padding, intron_out) = self.decide_number_string_character(char, wait_value, cds_count,
+                                                                                      amino_acid_counter,
+                                                                                      post_protein_printer,
+                                                                                      intron_offset,
+                                                                                      intron_in_padding,
+                                                                                      len(protein), intron_out)
+                number_string.append(next_number_string)
+            if lines[1]:
+                blocks[position].append(tuple(''.join(line) for line in lines))
+        return blocks
+
+    def print_text_header(self, latex_dict):
+        """ The gene, transcript and date lines, and a key to the lines of each block """
+        self.nm = latex_dict.get('NM_number', '')
+        self.line_printer('Gene: %s - Sequence: %s' % (self.transcriptdict['genename'],
+                                                        self.transcriptdict['refseqname']))
+        self.line_printer('Transcript: %s - Protein: %s' % (self.nm, latex_dict.get('NP_number', '')))
+        if self.file_type == 'lrg':
+            self.line_printer('LRG: %s - Date : %s' % (self.filename.replace('\\_', '_'), time.strftime('%d/%m/%Y')))
+        else:
+            self.line_printer('Date : %s' % time.strftime('%d/%m/%Y'))
+        self.line_printer('Author: %s' % self.username)
+        self.line_printer('')
+        self.line_printer('1st line: Base numbering. Full stops for intronic +/- 5, 10, 15...')
+        self.line_printer('2nd line: Base sequence. lower case Introns, upper case Exons')
+        self.line_printer('Primers are marked by letters under the bases they cover')
+        self.line_printer('3rd line: Amino acid sequence. Printed on FIRST base of codon')
+        self.line_printer('4th line: Amino acid numbering. Numbered on 1st and increments of 10')
+        self.line_printer('')
+
+    @staticmethod
+    def marker(index):
+        return ascii_uppercase[index % len(ascii_uppercase)]
+
+    def annotation_markers(self, length, annotations):
+        """ The marker line for a whole exon: each primer's letter under the bases it covers """
+        pieces = []
+        cursor = 0
+        for index, (start, end, label) in enumerate(annotations):
+            pieces.append(' ' * (start - cursor))
+            pieces.append(self.marker(index) * (end - start))
+            cursor = end
+        pieces.append(' ' * (length - cursor))
+        return ''.join(pieces)
+
+    def dna_lines(self, sequence, annotations):
+        """ The bases in lines of 60, without any highlighting """
+        return [sequence[line_start:line_start + self.line_length]
+                for line_start in range(0, len(sequence), self.line_length)]
@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+import time
+from subprocess import Popen, STDOUT
+from disk_cache import replace_file
+
+__author__ = 'mwelland'
+__version__ = 0.1
+__version_date__ = '17/10/2026'
+''' Runs pdflatex for a set of written .tex files, several at a time
+
+    Each job is moved into its own scratch directory inside the output
+    directory before pdflatex is started, so the .aux, .log and .out files
+    of concurrent jobs never meet and nothing needs cleaning up in the
+    output directory itself. When a job ends only the PDF is moved back
+    into the output directory and the .tex into 'tex files'; the scratch
+    directory is then deleted. Jobs which run past the timeout are killed,
+    and the pdflatex log of any failed job is kept in its result
+'''
+
+default_timeout = 300
+poll_interval = 0.05
+
+
+def get_version():
+    """
+    Quick function to grab version details for final printing
+    :return:
+    """
+    return 'Version: {0}, Version Date: {1}'.format(str(__version__), __version_date__)
+
+
+class TypesetJob:
+    """
+    A single pdflatex run. Once finished, success is True if pdflatex returned 0 and
+    produced the PDF, and log holds the pdflatex log if it did not
+    """
+
+    def __init__(self, latex_file, pdf_file, output_dir):
+        self.latex_file = latex_file
+        self.pdf_file = pdf_file
+        self.output_dir = output_dir
+        self.latex_name = os.path.basename(latex_file)
+        self.pdf_name = os.path.basename(pdf_file)
+        self.scratch = None
+        self.process = None
+        self.started = None
+        self.return_code = None
+        self.timed_out = False
+        self.success = False
+        self.log = ''
+        self.error = ''
+
+    def start(self):
+        self.scratch = tempfile.mkdtemp(dir=self.output_dir, prefix='.typeset-')
+        os.rename(self.latex_file, os.path.join(self.scratch, self.latex_name))
+        self.started = time.time()
+        with open(os.devnull, 'w') as devnull:
+            try:
+                self.process = Popen(["pdflatex", "-interaction=batchmode", self.latex_name],
+                                     cwd=self.scratch, stdout=devnull, stderr=STDOUT)
+            except OSError as error:
+                self.error = 'pdflatex could not be run: %s' % error
+                self.finish()
+
+    def poll(self, timeout):
+        """
+        :return: True once the job has finished, killing it if it has run too long
+        """
+        if self.process is None:
+            return True
+        if self.process.poll() is None:
+            if time.time() - self.started < timeout:
+                return False
+            self.process.kill()
+            self.process.wait()
+            self.timed_out = True
+            self.error = 'pdflatex timed out after %ds' % timeout
+        self.return_code = self.process.returncode
+        self.finish()
+        return True
+
+    def finish(self):
+        """ Moves the PDF and TeX into place, keeps the log on failure and removes the scratch directory """
+        scratch_pdf = os.path.join(self.scratch, self.pdf_name)
+        if not self.timed_out and os.path.exists(scratch_pdf):
+            replace_file(scratch_pdf, self.pdf_file)
+            self.success = self.return_code == 0
+        elif not self.error:
+            self.error = 'pdflatex did not produce %s' % self.pdf_name
+        if self.return_code and not self.error:
+            self.error = 'pdflatex returned %d' % self.return_code
+        if not self.success:
+            log_name = os.path.join(self.scratch, os.path.splitext(self.latex_name)[0] + '.log')
+            if os.path.exists(log_name):
+                with open(log_name) as log:
+                    self.log = log.read()
+        replace_file(os.path.join(self.scratch, self.latex_name),
+                     os.path.join(self.output_dir, 'tex files', self.latex_name))
+        shutil.rmtree(self.scratch, ignore_errors=True)
+        self.process = None
+
+
+def typeset_all(latex_jobs, jobs=1, timeout=default_timeout):
+    """
+    Runs pdflatex for every job, with up to 'jobs' processes at once
+
+    :param latex_jobs: list of (latex_file, pdf_file, output_dir) tuples
+    :param jobs: maximum number of concurrent pdflatex processes
+    :param timeout: seconds allowed for each job before it is killed
+    :return: list of the finished TypesetJob instances, in the order given
+    """
+    finished = [TypesetJob(*job) for job in latex_jobs]
+    waiting = list(finished)
+    running = []
+    try:
+        while waiting or running:
+            while waiting and len(running) < max(1, jobs):
+                job = waiting.pop(0)
+                job.start()
+                running.append(job)
+            running = [job for job in running if not job.poll(timeout)]
+            if running:
+                time.sleep(poll_interval)
+    finally:
+        for job in running:
+            job.process.kill()
+            job.process.wait()
+            job.finish()
+    return finished